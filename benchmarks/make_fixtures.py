@@ -0,0 +1,151 @@
+"""
+Generates a synthetic Hall-Hoag mods-dir and tracker-tree, for `run_benchmarks.py`.
+
+Example usage:
+    $ python ./benchmarks/make_fixtures.py --files 10000 --output_dir "/tmp/hh_fixture_10k"
+
+Produces:
+- `mods/batch_0000/HH000000.mods.xml`, `mods/batch_0000/HH000000_0001.mods.xml`, etc.
+    - each org gets an org-mods file plus a varying number of item-mods files (page-scans), up to --max_items_per_org.
+    - files are split into batch sub-dirs of 1000, like the pre-produced mods-files.
+- `tracker/HH00/0000/HH000000__item_updated.json`, etc., in the `update_hhoag_mods_for_org.py` layout.
+    - roughly --done_fraction of orgs are fully processed; some of their items get `__item_problem.json` files instead.
+- `fixture_info.json`, describing the fixture; read by `run_benchmarks.py`.
+
+The output is deterministic for a given set of args (seeded random).
+"""
+
+import argparse, json, logging, pathlib, random, sys, time
+
+
+## setup logging ----------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
+    datefmt='%d/%b/%Y %H:%M:%S' )
+log = logging.getLogger( __name__ )
+
+MODS_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<mods:mods xmlns:mods="http://www.loc.gov/mods/v3" version="3.7">
+  <mods:titleInfo>
+    <mods:title>Synthetic Hall-Hoag record {hh_id}</mods:title>
+  </mods:titleInfo>
+  <mods:identifier type="local">{hh_id}</mods:identifier>
+</mods:mods>
+'''
+BATCH_SIZE = 1000
+
+
+## helpers start (manager function is after helpers) ----------------
+
+
+def config_parser() -> argparse.ArgumentParser:
+    """ Configures parser.
+        Called by dundermain. """
+    parser = argparse.ArgumentParser( description='Generates a synthetic Hall-Hoag mods-dir and tracker-tree.' )
+    parser.add_argument( '--files', required=True, type=int, help='total number of mods-files to generate; eg 1000 to 1000000' )
+    parser.add_argument( '--output_dir', required=True, help='takes path to the (new) fixture directory' )
+    parser.add_argument( '--max_items_per_org', required=False, type=int, default=60, help='optional; defaults to 60' )
+    parser.add_argument( '--done_fraction', required=False, type=float, default=0.5, help='optional; fraction of orgs already processed; defaults to 0.5' )
+    parser.add_argument( '--problem_fraction', required=False, type=float, default=0.02, help='optional; fraction of processed items that are problems; defaults to 0.02' )
+    parser.add_argument( '--seed', required=False, type=int, default=1, help='optional; defaults to 1' )
+    return parser
+
+
+def make_hh_ids( total_files: int, max_items_per_org: int, rng: random.Random ) -> list:
+    """ Returns a list of (org, [hh_ids]) tuples totalling `total_files` ids.
+        Called by manage_fixture_creation().
+    >>> orgs = make_hh_ids( 5, 3, random.Random(1) )
+    >>> sum( len(hh_ids) for (org, hh_ids) in orgs )
+    5
+    >>> orgs[0][1][0:2]
+    ['HH000000', 'HH000000_0001']
+    """
+    orgs = []
+    remaining: int = total_files
+    org_number = 0
+    while remaining > 0:
+        org = f'HH{org_number:06d}'
+        item_count: int = min( rng.randint(0, max_items_per_org), remaining - 1 )
+        hh_ids = [ org ] + [ f'{org}_{i:04d}' for i in range(1, item_count + 1) ]
+        orgs.append( (org, hh_ids) )
+        remaining -= len( hh_ids )
+        org_number += 1
+    return orgs
+
+
+def write_mods_files( orgs: list, mods_dir: pathlib.Path ) -> None:
+    """ Writes the mods-files into batch sub-dirs.
+        Called by manage_fixture_creation(). """
+    file_count = 0
+    batch_dir = mods_dir
+    for ( org, hh_ids ) in orgs:
+        for hh_id in hh_ids:
+            if file_count % BATCH_SIZE == 0:
+                batch_dir = mods_dir / f'batch_{file_count // BATCH_SIZE:04d}'
+                batch_dir.mkdir( parents=True, exist_ok=True )
+            ( batch_dir / f'{hh_id}.mods.xml' ).write_text( MODS_TEMPLATE.format(hh_id=hh_id) )
+            file_count += 1
+    log.info( f'wrote ``{file_count}`` mods-files' )
+    return
+
+
+def write_tracker_files( orgs: list, tracker_dir: pathlib.Path, done_fraction: float, problem_fraction: float, rng: random.Random ) -> dict:
+    """ Writes item- and org-tracker files for the 'done' orgs; returns counts.
+        Called by manage_fixture_creation(). """
+    counts = { 'orgs_done': 0, 'items_done': 0, 'items_problem': 0 }
+    updated_msg: str = json.dumps( {'timestamp': '2024-01-01 00:00:00', 'message': 'all_good'}, sort_keys=True, indent=2 )
+    problem_msg: str = json.dumps( {'timestamp': '2024-01-01 00:00:00', 'err': 'WARNING: pid not found for item'}, sort_keys=True, indent=2 )
+    org_msg: str = json.dumps( {'timestamp': '2024-01-01 00:00:00', 'message': 'org_processed'}, sort_keys=True, indent=2 )
+    for ( org, hh_ids ) in orgs:
+        if rng.random() >= done_fraction:
+            continue
+        org_dir = tracker_dir / org[:4] / org[4:8]
+        org_dir.mkdir( parents=True, exist_ok=True )
+        for hh_id in hh_ids:
+            if rng.random() < problem_fraction:
+                ( org_dir / f'{hh_id}__item_problem.json' ).write_text( problem_msg )
+                counts['items_problem'] += 1
+            else:
+                ( org_dir / f'{hh_id}__item_updated.json' ).write_text( updated_msg )
+                counts['items_done'] += 1
+        ( org_dir / f'{org}__whole_org_updated.json' ).write_text( org_msg )
+        counts['orgs_done'] += 1
+    log.info( f'tracker counts, ``{counts}``' )
+    return counts
+
+
+## manager function -------------------------------------------------
+
+def manage_fixture_creation( args: argparse.Namespace ) -> None:
+    """ Manager function
+        Called by dundermain. """
+    output_dir = pathlib.Path( args.output_dir ).resolve()
+    if output_dir.exists() and any( output_dir.iterdir() ):
+        print( f'Error: The path {output_dir} already exists and is not empty.', file=sys.stderr )
+        sys.exit(1)
+    rng = random.Random( args.seed )
+    orgs: list = make_hh_ids( args.files, args.max_items_per_org, rng )
+    write_mods_files( orgs, output_dir / 'mods' )
+    counts: dict = write_tracker_files( orgs, output_dir / 'tracker', args.done_fraction, args.problem_fraction, rng )
+    largest_org, largest_hh_ids = max( orgs, key=lambda org_tuple: len(org_tuple[1]) )
+    fixture_info = {
+        'files': args.files,
+        'orgs': len( orgs ),
+        'largest_org': largest_org,
+        'largest_org_items': len( largest_hh_ids ),
+        'args': vars( args ),
+        **counts }
+    ( output_dir / 'fixture_info.json' ).write_text( json.dumps(fixture_info, sort_keys=True, indent=2) )
+    log.info( f'fixture_info, ``{fixture_info}``' )
+    return
+
+
+## dunndermain ------------------------------------------------------
+if __name__ == '__main__':
+    start_time = time.monotonic()
+    parser: argparse.ArgumentParser = config_parser()
+    args: argparse.Namespace = parser.parse_args()
+    manage_fixture_creation( args )
+    elapsed_time = time.monotonic() - start_time
+    log.info( f'total elapsed time, ``{elapsed_time:.2f}`` seconds' )
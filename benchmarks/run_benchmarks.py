@@ -0,0 +1,263 @@
+"""
+Micro-benchmarks for the local hot-paths of the scripts, over a synthetic fixture from `make_fixtures.py`.
+
+Example usage:
+    $ python ./benchmarks/make_fixtures.py --files 100000 --output_dir "/tmp/hh_fixture_100k"
+    $ python ./benchmarks/run_benchmarks.py --fixture_dir "/tmp/hh_fixture_100k" --output_path "./results.json" --save_baseline "./baseline_100k.json"
+    ... make changes ...
+    $ python ./benchmarks/run_benchmarks.py --fixture_dir "/tmp/hh_fixture_100k" --output_path "./results.json" --baseline "./baseline_100k.json"
+
+Notes:
+- The scripts are imported as-is, so each needs its usual `.env` and requirements;
+  a script that can't be imported is reported, and its benchmarks are skipped.
+- Loggers are set to INFO (the production console level) while benchmarking, so log-formatting cost
+  is only what's paid at INFO, eg eager `pprint.pformat()` calls inside `log.debug()` f-strings.
+- When comparing, a benchmark is a regression, and the script exits with status 1, only if its fastest run (`min_s`, the
+  least noisy statistic) is both more than `--tolerance` slower, and more than `--min_slowdown_ms` slower, than the baseline's.
+  Benchmarks marked `gated: false` (eg, the near-zero guarded-logging one) are reported, but never flagged.
+  If anything is flagged, the whole suite is run once more, and each benchmark keeps its faster pass, so that
+  a burst of background load doesn't fail the check by itself.
+"""
+
+import argparse, importlib, json, logging, pathlib, platform, pprint, statistics, sys, tempfile, time
+
+
+## setup logging ----------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
+    datefmt='%d/%b/%Y %H:%M:%S' )
+log = logging.getLogger( __name__ )
+
+REPO_ROOT = pathlib.Path( __file__ ).resolve().parent.parent
+SCRIPT_MODULES = {  # module-name: directory
+    'update_hhoag_mods_for_org': 'update_hhoag_mods',
+    'save_mods': 'save_mods_to_dir',
+    'collections_list': 'solr_collections' }
+FILE_SAMPLE_SIZE = 5000  # cap for benchmarks that write or parse files
+
+
+## helpers start (manager function is after helpers) ----------------
+
+
+def config_parser() -> argparse.ArgumentParser:
+    """ Configures parser.
+        Called by dundermain. """
+    parser = argparse.ArgumentParser( description='Runs micro-benchmarks over a synthetic Hall-Hoag fixture.' )
+    parser.add_argument( '--fixture_dir', required=True, help='takes path to a directory made by `make_fixtures.py`' )
+    parser.add_argument( '--output_path', required=True, help='takes path to write the results-json to' )
+    parser.add_argument( '--baseline', required=False, help='optional; path to a baseline results-json to compare against' )
+    parser.add_argument( '--save_baseline', required=False, help='optional; path to also save these results to, as a new baseline' )
+    parser.add_argument( '--tolerance', required=False, type=float, default=0.20, help='optional; allowed slowdown vs baseline; defaults to 0.20 (20%%)' )
+    parser.add_argument( '--min_slowdown_ms', required=False, type=float, default=5.0, help='optional; smallest absolute slowdown, in milliseconds, that counts as a regression; defaults to 5.0' )
+    parser.add_argument( '--repeat', required=False, type=int, default=5, help='optional; timed runs per benchmark; defaults to 5' )
+    return parser
+
+
+def import_script_modules() -> dict:
+    """ Imports the scripts' modules; returns { module-name: module }, omitting any that can't be imported.
+        Called by manage_benchmarks(). """
+    modules = {}
+    for module_name, dir_name in SCRIPT_MODULES.items():
+        sys.path.insert( 0, str(REPO_ROOT / dir_name) )
+        try:
+            modules[ module_name ] = importlib.import_module( module_name )
+        except ( ImportError, KeyError, OSError, AssertionError ) as e:  # missing requirement, envar, or `.env`
+            log.warning( f'WARNING: skipping benchmarks for ``{module_name}``; import failed, ``{repr(e)}``' )
+    for name in [ *modules, 'common.tracing_helper' ]:
+        logging.getLogger( name ).setLevel( logging.INFO )
+    logging.getLogger().setLevel( logging.INFO )
+    return modules
+
+
+def time_it( func, repeat: int ) -> dict:
+    """ Runs func `repeat` times (after one warm-up run); returns min and median seconds.
+        Called by run_benchmark().
+    >>> result = time_it( lambda: sum(range(10)), 3 )
+    >>> sorted( result.keys() )
+    ['median_s', 'min_s']
+    """
+    func()  # warm-up; also primes filesystem caches, so runs measure the code rather than the disk
+    durations = []
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        func()
+        durations.append( time.perf_counter() - start )
+    return { 'min_s': min(durations), 'median_s': statistics.median(durations) }
+
+
+def run_benchmark( results: dict, name: str, func, item_count: int, repeat: int, gated: bool = True ) -> None:
+    """ Times a benchmark and adds it to results.
+        `gated=False` is for benchmarks too fast to compare reliably; they're reported, but never flagged as regressions.
+        Called by the bench_ functions. """
+    timing: dict = time_it( func, repeat )
+    timing['items'] = item_count
+    timing['gated'] = gated
+    timing['per_item_us'] = ( timing['median_s'] / item_count * 1_000_000 ) if item_count else 0.0
+    results[ name ] = timing
+    log.info( f'{name}: median ``{timing["median_s"]:.4f}``s; ``{timing["per_item_us"]:.2f}``us/item; items ``{item_count}``' )
+    return
+
+
+def bench_update_hhoag_mods( uhhm, fixture_dir: pathlib.Path, fixture_info: dict, results: dict, repeat: int ) -> None:
+    """ Benchmarks `update_hhoag_mods_for_org.py` local hot-paths.
+        Called by manage_benchmarks(). """
+    mods_dir = fixture_dir / 'mods'
+    tracker_dir = fixture_dir / 'tracker'
+    org: str = fixture_info['largest_org']
+    ## mods-dir walking ---------------------------------------------
+    run_benchmark( results, 'uhhm.get_filepath_data__rglob', lambda: uhhm.get_filepath_data(org, mods_dir), fixture_info['files'], repeat )
+    run_benchmark( results, 'uhhm.index_mods_files', lambda: uhhm.index_mods_files(mods_dir), fixture_info['files'], repeat )
+    mods_index: dict = uhhm.index_mods_files( mods_dir )
+    run_benchmark( results, 'uhhm.get_filepath_data__indexed', lambda: uhhm.get_filepath_data(org, mods_dir, mods_index), fixture_info['largest_org_items'], repeat )
+    ## parse_id -----------------------------------------------------
+    mods_paths: list = [ path for paths in mods_index.values() for path in paths ]
+    run_benchmark( results, 'uhhm.parse_id', lambda: [ uhhm.parse_id(path) for path in mods_paths ], len(mods_paths), repeat )
+    ## merge (the whole fixture as one org, to get a large merge) ---
+    all_org_data = { uhhm.parse_id(path): {'path': path} for path in mods_paths }
+    api_data = [ {'mods_id_local_ssim': [hh_id], 'pid': f'bdr:{i}', 'primary_title': 'x'} for i, hh_id in enumerate(all_org_data) ]
+    run_benchmark( results, 'uhhm.merge_api_data_into_org_data', lambda: uhhm.merge_api_data_into_org_data(all_org_data, api_data), len(api_data), repeat )
+    ## tracker i/o --------------------------------------------------
+    hh_ids: list = list( all_org_data.keys() )
+    def check_all_trackers() -> None:
+        for hh_id in hh_ids:
+            uhhm.check_tracker( uhhm.get_item_tracker_filepath(hh_id, tracker_dir) )
+    run_benchmark( results, 'uhhm.check_tracker', check_all_trackers, len(hh_ids), repeat )
+    sample_ids: list = hh_ids[0:FILE_SAMPLE_SIZE]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_tracker_dir = pathlib.Path( temp_dir )
+        def update_sample_trackers() -> None:
+            for i, hh_id in enumerate( sample_ids ):
+                uhhm.update_item_tracker( uhhm.get_item_tracker_filepath(hh_id, temp_tracker_dir), 'err' if i % 50 == 0 else '' )
+        run_benchmark( results, 'uhhm.update_item_tracker', update_sample_trackers, len(sample_ids), repeat )
+    ## eager debug-logging, at INFO ---------------------------------
+    sorted_org_data = dict( sorted(all_org_data.items()) )
+    def eager_debug() -> None:
+        uhhm.log.debug( f'org_data, partial, ``{pprint.pformat(sorted_org_data)[0:1000]}...``' )
+    def guarded_debug() -> None:
+        if uhhm.log.isEnabledFor( logging.DEBUG ):
+            uhhm.log.debug( f'org_data, partial, ``{pprint.pformat(sorted_org_data)[0:1000]}...``' )
+    run_benchmark( results, 'logging.eager_pformat_debug_at_info', eager_debug, len(sorted_org_data), repeat )
+    run_benchmark( results, 'logging.guarded_pformat_debug_at_info', guarded_debug, len(sorted_org_data), repeat, gated=False )  # nanoseconds; all noise
+    return
+
+
+def bench_save_mods( save_mods, fixture_dir: pathlib.Path, fixture_info: dict, results: dict, repeat: int ) -> None:
+    """ Benchmarks `save_mods.py` local hot-paths.
+        Called by manage_benchmarks(). """
+    pids = [ f'bdr:{i:08x}' for i in range(fixture_info['files']) ]
+    output_dir = fixture_dir / 'output'
+    run_benchmark( results, 'save_mods.make_output_filepath', lambda: [ save_mods.make_output_filepath(output_dir, pid) for pid in pids ], len(pids), repeat )
+    sample_paths: list = sorted( (fixture_dir / 'mods').rglob('*.mods.xml') )[0:FILE_SAMPLE_SIZE]
+    run_benchmark( results, 'save_mods.check_well_formed_xml', lambda: [ save_mods.check_well_formed_xml(path, path.name) for path in sample_paths ], len(sample_paths), repeat )
+    return
+
+
+def bench_collections_list( collections_list, fixture_info: dict, results: dict, repeat: int ) -> None:
+    """ Benchmarks the facet-to-dict conversion in `collections_list.py`, with one facet per fixture-file.
+        Called by manage_benchmarks(). """
+    facet_counts = []
+    for i in range( fixture_info['files'] ):
+        facet_counts.extend( [f'collection {i}', i] )
+    run_benchmark( results, 'collections_list.facet_counts_to_dict', lambda: collections_list.facet_counts_to_dict(facet_counts), fixture_info['files'], repeat )
+    return
+
+
+def run_all_benchmarks( modules: dict, fixture_dir: pathlib.Path, fixture_info: dict, repeat: int ) -> dict:
+    """ Runs the benchmarks for each imported script; returns { benchmark-name: timing-dict }.
+        Called by manage_benchmarks(). """
+    results = {}
+    if 'update_hhoag_mods_for_org' in modules:
+        bench_update_hhoag_mods( modules['update_hhoag_mods_for_org'], fixture_dir, fixture_info, results, repeat )
+    if 'save_mods' in modules:
+        bench_save_mods( modules['save_mods'], fixture_dir, fixture_info, results, repeat )
+    if 'collections_list' in modules:
+        bench_collections_list( modules['collections_list'], fixture_info, results, repeat )
+    return results
+
+
+def keep_faster_pass( results: dict, recheck_results: dict ) -> dict:
+    """ Returns, for each benchmark, whichever pass's timing has the lower `min_s`.
+        Called by manage_benchmarks().
+    >>> keep_faster_pass( {'a': {'min_s': 2.0}, 'b': {'min_s': 1.0}}, {'a': {'min_s': 1.5}, 'b': {'min_s': 1.2}} )
+    {'a': {'min_s': 1.5}, 'b': {'min_s': 1.0}}
+    """
+    return { name: min( timing, recheck_results.get(name, timing), key=lambda t: t['min_s'] ) for name, timing in results.items() }
+
+
+def compare_to_baseline( results: dict, baseline: dict, tolerance: float, min_slowdown_s: float ) -> list:
+    """ Compares fastest-run times (`min_s`) to the baseline; returns the names of regressed benchmarks.
+        A regression must exceed both the relative `tolerance` and the absolute `min_slowdown_s`, so that
+          jitter on very fast benchmarks isn't flagged; un-gated benchmarks are only reported.
+        Called by manage_benchmarks().
+    >>> results = { 'a': {'min_s': 1.5}, 'b': {'min_s': 1.0}, 'c': {'min_s': 1.0}, 'd': {'min_s': 0.002}, 'e': {'min_s': 3.0, 'gated': False} }
+    >>> baseline = { 'results': {'a': {'min_s': 1.0}, 'b': {'min_s': 1.0}, 'd': {'min_s': 0.001}, 'e': {'min_s': 1.0}} }
+    >>> compare_to_baseline( results, baseline, 0.2, 0.005 )
+    ['a']
+    """
+    regressions = []
+    for name, timing in results.items():
+        baseline_timing = baseline['results'].get( name )
+        if not baseline_timing:
+            log.info( f'{name}: no baseline' )
+            continue
+        ratio: float = timing['min_s'] / baseline_timing['min_s'] if baseline_timing['min_s'] else 0.0
+        slowdown_s: float = timing['min_s'] - baseline_timing['min_s']
+        if not timing.get( 'gated', True ):
+            status = 'not gated'
+        elif ratio > 1 + tolerance and slowdown_s > min_slowdown_s:
+            status = 'REGRESSION'
+        else:
+            status = 'ok'
+        log.info( f'{name}: ``{ratio:.2f}``x baseline; ``{slowdown_s * 1000:+.2f}``ms; {status}' )
+        if status == 'REGRESSION':
+            regressions.append( name )
+    return regressions
+
+
+## manager function -------------------------------------------------
+
+def manage_benchmarks( args: argparse.Namespace ) -> int:
+    """ Manager function
+        Returns the process exit-status.
+        Called by dundermain. """
+    fixture_dir = pathlib.Path( args.fixture_dir ).resolve()
+    fixture_info: dict = json.loads( (fixture_dir / 'fixture_info.json').read_text() )
+    log.info( f'fixture, ``{fixture_dir}``; files, ``{fixture_info["files"]}``; orgs, ``{fixture_info["orgs"]}``' )
+    modules: dict = import_script_modules()
+    results: dict = run_all_benchmarks( modules, fixture_dir, fixture_info, args.repeat )
+    regressions = []
+    if args.baseline:
+        baseline: dict = json.loads( pathlib.Path(args.baseline).read_text() )
+        if baseline['fixture']['files'] != fixture_info['files']:
+            log.warning( f'WARNING: baseline fixture has ``{baseline["fixture"]["files"]}`` files; this one has ``{fixture_info["files"]}``' )
+        regressions: list = compare_to_baseline( results, baseline, args.tolerance, args.min_slowdown_ms / 1000 )
+        if regressions:
+            log.info( f'possible regressions, ``{regressions}``; re-running the benchmarks to confirm' )
+            results = keep_faster_pass( results, run_all_benchmarks(modules, fixture_dir, fixture_info, args.repeat) )
+            regressions = compare_to_baseline( results, baseline, args.tolerance, args.min_slowdown_ms / 1000 )
+    output = {
+        'timestamp': time.strftime( '%Y-%m-%d %H:%M:%S', time.localtime() ),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fixture': fixture_info,
+        'results': results }
+    for output_path in filter( None, [args.output_path, args.save_baseline] ):
+        pathlib.Path( output_path ).write_text( json.dumps(output, sort_keys=True, indent=2) )
+        log.info( f'results saved to, ``{output_path}``' )
+    exit_status = 0
+    if regressions:
+        log.warning( f'WARNING: regressions, ``{regressions}``' )
+        exit_status = 1
+    return exit_status
+
+
+## dunndermain ------------------------------------------------------
+if __name__ == '__main__':
+    start_time = time.monotonic()
+    parser: argparse.ArgumentParser = config_parser()
+    args: argparse.Namespace = parser.parse_args()
+    exit_status: int = manage_benchmarks( args )
+    elapsed_time = time.monotonic() - start_time
+    log.info( f'total elapsed time, ``{elapsed_time:.2f}`` seconds' )
+    sys.exit( exit_status )
@@ -0,0 +1,305 @@
+"""
+Polls the BDR search-api for objects modified since the last run, and writes a changed-PID stream.
+
+Keeps a high-water mark (the latest last-modified timestamp seen, capped at the run's start minus a safety-lag) in a state-file,
+  so each run only pages through what changed.
+
+Typical usage:
+$ cd /path/to/bdr_scripts_public/change_feed/
+$ source ../../env/bin/activate
+$ python ./change_feed.py --state_path "/path/to/change_feed_state.json" --pids_path "/path/to/changed_pids.txt" --changes_path "/path/to/changes.jsonl"
+
+Outputs:
+- each run writes its own files, named from the given paths plus the run's start-time, eg `changed_pids_20240101T000000Z.txt`,
+    so an earlier run's output is never overwritten before it's been consumed. A run with no changes writes no files.
+- `--pids_path`: changed pids, one per line; usable as `save_mods.py --pids_list_path` input, for delta MODS downloads.
+- `--changes_path` (optional): one json-line per changed object: pid, last-modified timestamp, and collection-names.
+- the state-file also records, per collection, how many of its objects changed; ie, which collections a dashboard would need to re-count.
+    These are not changes in collection item-counts: edits don't change counts, and deletions aren't visible.
+
+First run:
+- with no state-file, pass `--since "2024-01-01T00:00:00Z"` to start from a given time; otherwise the high-water mark is set to now, and nothing is emitted.
+
+Notes:
+- the high-water mark is only advanced after the outputs are written, so an interrupted run re-emits, rather than skips, changes.
+- the range-query is inclusive, so objects modified at exactly the high-water mark are re-emitted once; consumers should treat the stream as at-least-once.
+- consumers should process the per-run files oldest-first (the names sort by time), and remove or move each one only once it's been handled;
+    a consumer that skips or fails a night then catches up on the next, rather than losing that night's changes.
+- the high-water mark never passes the run's start minus `CF__SAFETY_SECONDS`, because solr commit/index-lag means an object
+    modified earlier can become visible after a later one; objects in that overlap are re-emitted by the next run, rather than lost.
+- deletions don't appear in the search-api, so they aren't in the feed.
+
+Note that some of the functions contain doctests. All doctests can be run with the following command:
+`python -m doctest ./change_feed/change_feed.py -v`
+"""
+
+import argparse, collections, json, logging, os, pathlib, sys, time
+
+import requests
+from dotenv import load_dotenv, find_dotenv
+
+sys.path.insert( 0, str(pathlib.Path(__file__).resolve().parent.parent) )  # repo-root, for `common`
+from common.tracing_helper import TRACER
+
+
+## load envars & constants ------------------------------------------
+dotenv_abs_path = pathlib.Path(__file__).resolve().parent.parent.parent / '.env_change_feed'
+assert dotenv_abs_path.exists(), f'file does not exist, ``{dotenv_abs_path}``'
+load_dotenv(
+    find_dotenv( str(dotenv_abs_path), raise_error_if_not_found=True ),
+    override=True
+    )
+LOGLEVEL: str = os.environ.get( 'CF__LOGLEVEL', 'INFO' )  # 'DEBUG' or 'INFO'
+SEARCH_API_URL: str = os.environ[ 'CF__SEARCH_API_URL' ]
+MODIFIED_FIELD: str = os.environ.get( 'CF__MODIFIED_FIELD', 'object_last_modified_dsi' )  # solr last-modified date-field
+COLLECTION_FIELD: str = os.environ.get( 'CF__COLLECTION_FIELD', 'ir_collection_name' )
+ROWS: int = int( os.environ.get('CF__ROWS', 500) )  # page-size
+SAFETY_SECONDS: int = int( os.environ.get('CF__SAFETY_SECONDS', 300) )  # the high-water mark stays this far behind the run's start, to allow for index-lag
+
+
+## setup console logging --------------------------------------------
+lglvldct = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO }
+logging.basicConfig(
+    level=lglvldct[LOGLEVEL],  # assigns the level-object to the level-key loaded from the envar
+    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
+    datefmt='%d/%b/%Y %H:%M:%S' )
+log = logging.getLogger( __name__ )
+
+
+## helpers start (manager function is after helpers) ----------------
+
+
+def config_parser() -> argparse.ArgumentParser:
+    """ Configures the argument parser.
+        Called by parse_args(). """
+    desc = """Writes the pids of BDR objects modified since the last run.
+- Takes a state-filepath (holding the high-water mark), and output filepaths, as arguments.
+"""
+    parser = argparse.ArgumentParser( description=desc, formatter_class=argparse.RawTextHelpFormatter )
+    parser.add_argument( '--check_envars', required=False, action='store_true', help='optional; displays envars, and exits' )
+    parser.add_argument( '--state_path', required=False, help='required; filepath of the state-json; created if it does not exist' )
+    parser.add_argument( '--pids_path', required=False, help='required; filepath to write changed pids to, one per line; each run adds its start-time to the filename' )
+    parser.add_argument( '--changes_path', required=False, help='optional; filepath to write changed-object json-lines to; each run adds its start-time to the filename' )
+    parser.add_argument( '--since', required=False, help='optional; solr timestamp, eg "2024-01-01T00:00:00Z"; overrides the stored high-water mark' )
+    parser.add_argument( '--profile', required=False, help='optional; filepath to write cProfile/pstats output to' )
+    parser.add_argument( '--trace', required=False, help='optional; filepath to write Chrome trace-event JSON to' )
+    return parser
+
+
+def display_envars() -> None:
+    """ Displays envars.
+        Called by parse_args(). """
+    print( f'''
+Envars:
+
+For this `change_feed.py` script...
+- LOGLEVEL, ``{LOGLEVEL}``
+- SEARCH_API_URL, ``{SEARCH_API_URL}``
+- MODIFIED_FIELD, ``{MODIFIED_FIELD}``
+- COLLECTION_FIELD, ``{COLLECTION_FIELD}``
+- ROWS, ``{ROWS}``
+- SAFETY_SECONDS, ``{SAFETY_SECONDS}``
+
+(end)
+''')
+    sys.exit( 0 )
+    return
+
+
+def load_state( state_path: pathlib.Path ) -> dict:
+    """ Loads the state-json; returns an empty state if there isn't one yet.
+        Called by manage_change_feed(). """
+    if not state_path.exists():
+        log.info( f'no state-file yet, at ``{state_path}``' )
+        return {}
+    with open( state_path, 'r' ) as f:
+        state: dict = json.load( f )
+    log.debug( f'state, ``{state}``' )
+    return state
+
+
+def now_solr_timestamp( seconds_ago: int = 0 ) -> str:
+    """ Returns the current UTC time, less `seconds_ago`, in solr's date-format.
+        Called by manage_change_feed(). """
+    return time.strftime( '%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - seconds_ago) )
+
+
+def build_query_params( high_water_mark: str, cursor_mark: str ) -> dict:
+    """ Builds the search-api params for one page of changes.
+        Sorting on the modified-field, then pid, gives the stable total order that cursor-paging requires.
+        Called by fetch_changes().
+    >>> params = build_query_params( '2024-01-01T00:00:00Z', '*' )
+    >>> params['q']
+    'object_last_modified_dsi:[2024-01-01T00:00:00Z TO *]'
+    >>> params['sort']
+    'object_last_modified_dsi asc,pid asc'
+    """
+    return {
+        'q': f'{MODIFIED_FIELD}:[{high_water_mark} TO *]',
+        'fl': f'pid,{MODIFIED_FIELD},{COLLECTION_FIELD}',
+        'sort': f'{MODIFIED_FIELD} asc,pid asc',
+        'rows': ROWS,
+        'cursorMark': cursor_mark }
+
+
+def fetch_changes( high_water_mark: str ) -> list:
+    """ Pages through objects modified at or after the high-water mark, using solr cursor-paging.
+        Called by manage_change_feed(). """
+    docs = []
+    cursor_mark = '*'
+    while True:
+        params: dict = build_query_params( high_water_mark, cursor_mark )
+        with TRACER.span( 'search_api_get', cat='network', cursor_mark=cursor_mark ):
+            response = requests.get( SEARCH_API_URL, params=params )
+            response.raise_for_status()
+            response_data: dict = response.json()
+        page_docs: list = response_data['response']['docs']
+        docs.extend( page_docs )
+        next_cursor_mark: str = response_data.get( 'nextCursorMark', '' )
+        log.debug( f'got ``{len(page_docs)}`` docs; next_cursor_mark, ``{next_cursor_mark}``' )
+        if not next_cursor_mark:
+            raise Exception( 'search-api response has no `nextCursorMark`; cursor-paging is not supported by this api' )
+        if next_cursor_mark == cursor_mark:  # solr's end-of-results signal
+            break
+        cursor_mark = next_cursor_mark
+    log.info( f'found ``{len(docs)}`` changed objects since ``{high_water_mark}``' )
+    return docs
+
+
+def summarize_changes( docs: list, high_water_mark: str, safe_cutoff: str ) -> tuple:
+    """ Returns (new_high_water_mark, changed_objects_by_collection) for the changed docs.
+        - The new mark is the latest modified-timestamp seen, but never later than safe_cutoff (the run's start minus the safety-lag),
+          and never earlier than the current mark.
+        - changed_objects_by_collection counts changed objects per collection; it says which collections to re-count, not by how much counts changed.
+        Solr returns dates in a single fixed format, so string-comparison orders them correctly.
+        Called by manage_change_feed().
+    >>> docs = [
+    ...     {'pid': 'bdr:1', 'object_last_modified_dsi': '2024-02-01T00:00:00Z', 'ir_collection_name': ['A', 'B']},
+    ...     {'pid': 'bdr:2', 'object_last_modified_dsi': '2024-03-01T00:00:00Z', 'ir_collection_name': ['A']},
+    ...     {'pid': 'bdr:3', 'object_last_modified_dsi': '2024-01-15T00:00:00Z'} ]
+    >>> summarize_changes( docs, '2024-01-01T00:00:00Z', '2024-06-01T00:00:00Z' )
+    ('2024-03-01T00:00:00Z', {'A': 2, 'B': 1})
+    >>> summarize_changes( docs, '2024-01-01T00:00:00Z', '2024-02-15T00:00:00Z' )[0]  # capped by the safety-lag
+    '2024-02-15T00:00:00Z'
+    >>> summarize_changes( [], '2024-01-01T00:00:00Z', '2023-12-31T23:55:00Z' )  # never moves backwards
+    ('2024-01-01T00:00:00Z', {})
+    """
+    latest_seen: str = max( [high_water_mark] + [doc.get(MODIFIED_FIELD, '') for doc in docs] )
+    new_high_water_mark: str = max( high_water_mark, min(latest_seen, safe_cutoff) )
+    changed_objects_by_collection = collections.Counter()
+    for doc in docs:
+        changed_objects_by_collection.update( doc.get(COLLECTION_FIELD, []) )
+    return ( new_high_water_mark, dict(sorted(changed_objects_by_collection.items())) )
+
+
+def make_run_filepath( path: pathlib.Path, run_started: str ) -> pathlib.Path:
+    """ Returns the run's own output-filepath: the given filename, plus the run's start-time.
+        Called by write_outputs().
+    >>> make_run_filepath( pathlib.Path('/path/to/changed_pids.txt'), '2024-01-01T00:00:00Z' )
+    PosixPath('/path/to/changed_pids_20240101T000000Z.txt')
+    """
+    run_stamp: str = run_started.replace( '-', '' ).replace( ':', '' )
+    return path.with_name( f'{path.stem}_{run_stamp}{path.suffix}' )
+
+
+def write_outputs( docs: list, pids_path: pathlib.Path, changes_path: pathlib.Path, run_started: str ) -> list:
+    """ Writes the changed pids, and, optionally, the changed-object json-lines, to the run's own files; returns their filepaths.
+        Writes to temp-files and renames, so consumers never see partial files.
+        Called by manage_change_feed(). """
+    if not docs:
+        log.info( 'no changes; no output-files written' )
+        return []
+    pids_path: pathlib.Path = make_run_filepath( pids_path, run_started )
+    if pids_path.exists():  # eg, two runs started in the same second; never overwrite unconsumed output
+        raise Exception( f'output-file already exists, ``{pids_path}``' )
+    pids_tmp_path = pids_path.with_name( f'{pids_path.name}.tmp' )
+    with open( pids_tmp_path, 'w' ) as f:
+        f.write( ''.join(f'{doc["pid"]}\n' for doc in docs) )
+    os.replace( pids_tmp_path, pids_path )
+    output_paths = [ pids_path ]
+    if changes_path:
+        changes_path: pathlib.Path = make_run_filepath( changes_path, run_started )
+        changes_tmp_path = changes_path.with_name( f'{changes_path.name}.tmp' )
+        with open( changes_tmp_path, 'w' ) as f:
+            for doc in docs:
+                record = { 'pid': doc['pid'], 'modified': doc.get(MODIFIED_FIELD, ''), 'collections': doc.get(COLLECTION_FIELD, []) }
+                f.write( json.dumps(record) + '\n' )
+        os.replace( changes_tmp_path, changes_path )
+        output_paths.append( changes_path )
+    log.info( f'wrote ``{len(docs)}`` changed pids to, ``{pids_path}``' )
+    return output_paths
+
+
+def save_state( state_path: pathlib.Path, state: dict ) -> None:
+    """ Saves the state-json, atomically.
+        Called by manage_change_feed(). """
+    state_tmp_path = state_path.with_name( f'{state_path.name}.tmp' )
+    with open( state_tmp_path, 'w' ) as f:
+        f.write( json.dumps(state, sort_keys=True, indent=2) )
+    os.replace( state_tmp_path, state_path )
+    return
+
+
+## manager function -------------------------------------------------
+
+
+def manage_change_feed( state_path: pathlib.Path, pids_path: pathlib.Path, changes_path: pathlib.Path, since: str ) -> None:
+    """ Manager function.
+        Loads the high-water mark, fetches changes since then, writes the outputs, then advances the mark.
+        Called by parse_args(). """
+    state: dict = load_state( state_path )
+    run_started: str = now_solr_timestamp()
+    safe_cutoff: str = now_solr_timestamp( seconds_ago=SAFETY_SECONDS )
+    high_water_mark: str = since or state.get( 'high_water_mark', '' )
+    if not high_water_mark:
+        log.info( f'no high-water mark, and no `--since`; starting the feed from now, less the safety-lag, ``{safe_cutoff}``' )
+        docs = []
+        new_high_water_mark, changed_objects_by_collection = safe_cutoff, {}
+    else:
+        docs: list = fetch_changes( high_water_mark )
+        new_high_water_mark, changed_objects_by_collection = summarize_changes( docs, high_water_mark, safe_cutoff )
+    output_paths: list = write_outputs( docs, pids_path, changes_path, run_started )
+    state.update( {
+        'high_water_mark': new_high_water_mark,
+        'last_run': run_started,
+        'last_run_output_paths': [ str(path) for path in output_paths ],
+        'last_run_changed_count': len( docs ),
+        'last_run_changed_objects_by_collection': changed_objects_by_collection } )
+    save_state( state_path, state )
+    log.info( f'high-water mark advanced from ``{high_water_mark}`` to ``{new_high_water_mark}``' )
+    return
+
+
+def parse_args():
+    """ Configures arg-parser and calls manager function.
+        Called by dundermain. """
+    ## config parser ------------------------------------------------
+    parser: argparse.ArgumentParser = config_parser()
+    ## grab args ----------------------------------------------------
+    args = parser.parse_args()
+    ## check envars -------------------------------------------------
+    if args.check_envars :
+        display_envars(); return
+    ## check required args ------------------------------------------
+    if not args.state_path or not args.pids_path:
+        print( 'Both --state_path and --pids_path are required.' )
+        sys.exit( 1 )
+    ## resolve paths ------------------------------------------------
+    state_path = pathlib.Path( args.state_path ).resolve()
+    pids_path = pathlib.Path( args.pids_path ).resolve()
+    changes_path = pathlib.Path( args.changes_path ).resolve() if args.changes_path else None
+    ## call manager function just above -----------------------------
+    TRACER.start( profile_path=args.profile, trace_path=args.trace )  # no-op unless `--profile` or `--trace` is passed
+    manage_change_feed( state_path, pids_path, changes_path, args.since )
+    TRACER.finish()
+    return
+
+
+## dundermain  ------------------------------------------------------
+if __name__ == '__main__':
+    start_time = time.monotonic()
+    parse_args()
+    elapsed_time = time.monotonic() - start_time
+    log.info( f'total elapsed time, ``{elapsed_time:.2f}`` seconds' )
@@ -0,0 +1,153 @@
+"""
+Optional profiling and span-tracing for the scripts in this repo.
+
+When enabled, produces:
+- a cProfile/pstats file (viewable with `python -m pstats the_file` or snakeviz).
+- a Chrome trace-event JSON file (viewable at <chrome://tracing> or <https://ui.perfetto.dev>),
+  with one span per named phase, network call, or subprocess call.
+
+When disabled (the default), `TRACER.span()` returns a shared no-op context-manager,
+  so the per-call overhead is a single attribute check.
+
+Usage from a script:
+    import pathlib, sys
+    sys.path.insert( 0, str(pathlib.Path(__file__).resolve().parent.parent) )  # repo-root, for `common`
+    from common.tracing_helper import TRACER
+
+    TRACER.start( profile_path=args.profile, trace_path=args.trace )  # both optional; either enables tracing
+    with TRACER.span( 'get_org_data_via_api', cat='network', org=org ):
+        ...
+    TRACER.finish()  # also registered with `atexit` by `start()`, so output is written if the run is interrupted or fails
+
+Note that some of the functions contain doctests. All doctests can be run with the following command:
+`python -m doctest ./common/tracing_helper.py -v`
+"""
+
+import atexit, contextlib, cProfile, io, json, logging, os, pathlib, pstats, threading, time
+
+
+log = logging.getLogger( __name__ )
+
+NOOP_SPAN = contextlib.nullcontext()  # shared; returned by `span()` when tracing is off
+
+
+class Tracer:
+    """ Holds profiling and span-trace state for a single run.
+        Instantiated once, as `TRACER`, below. """
+
+    def __init__( self ) -> None:
+        self.enabled: bool = False
+        self.events: list = []
+        self.profile_path = None  # pathlib.Path, once set
+        self.trace_path = None  # pathlib.Path, once set
+        self.profiler = None  # cProfile.Profile, once set
+        self.origin_ns: int = time.perf_counter_ns()
+
+    def start( self, profile_path: str = '', trace_path: str = '' ) -> None:
+        """ Enables tracing if either output-path is given; starts cProfile if `profile_path` is given.
+            Registers finish() with `atexit`, so a Ctrl-C'd or failed run still writes its pstats and trace files.
+            Called by each script's dundermain/arg-handler. """
+        if not profile_path and not trace_path:
+            return
+        self.enabled = True
+        self.origin_ns = time.perf_counter_ns()
+        if trace_path:
+            self.trace_path = pathlib.Path( trace_path ).resolve()
+        if profile_path:
+            self.profile_path = pathlib.Path( profile_path ).resolve()
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register( self.finish )
+        log.info( f'tracing enabled; profile_path, ``{self.profile_path}``; trace_path, ``{self.trace_path}``' )
+        return
+
+    def enable_for_worker( self, origin_ns: int = 0 ) -> None:
+        """ Enables span-collection (but not cProfile) in a multiprocessing worker.
+            Used as a `Pool(initializer=..., initargs=(TRACER.origin_ns,))`, so worker timestamps share the parent's origin;
+              worker events are returned to the parent via `drain()`. """
+        self.enabled = True
+        self.events = []
+        if origin_ns:
+            self.origin_ns = origin_ns
+        return
+
+    def span( self, name: str, cat: str = 'phase', **args ):
+        """ Returns a context-manager that records a complete ('X') trace-event.
+            `cat` is free-form; the scripts use 'phase', 'filesystem', 'network', 'subprocess', 'tracker_io', and 'xml'.
+        >>> t = Tracer()
+        >>> t.span( 'foo' ) is NOOP_SPAN
+        True
+        >>> t.enable_for_worker()
+        >>> with t.span( 'foo', cat='network', pid='bdr:123' ):
+        ...     pass
+        >>> ( t.events[0]['name'], t.events[0]['cat'], t.events[0]['ph'], t.events[0]['args'] )
+        ('foo', 'network', 'X', {'pid': 'bdr:123'})
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return self._record_span( name, cat, args )
+
+    @contextlib.contextmanager
+    def _record_span( self, name: str, cat: str, args: dict ):
+        """ Records the span, even if the wrapped block raises.
+            Called by span(). """
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end_ns = time.perf_counter_ns()
+            self.events.append( {
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': (start_ns - self.origin_ns) / 1000,  # trace-event format uses microseconds
+                'dur': (end_ns - start_ns) / 1000,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': { key: str(val) for key, val in args.items() },
+                } )
+
+    def drain( self ) -> list:
+        """ Returns and clears collected events; lets pool-workers hand their spans back to the parent.
+        >>> t = Tracer()
+        >>> t.drain()
+        []
+        """
+        events, self.events = self.events, []
+        return events
+
+    def add_events( self, events: list ) -> None:
+        """ Adds events collected elsewhere (ie, by pool-workers). """
+        if self.enabled and events:
+            self.events.extend( events )
+        return
+
+    def finish( self ) -> None:
+        """ Stops cProfile and writes the pstats and trace-event files; a no-op after the first call.
+            Called by each script's dundermain, and at interpreter exit via `atexit`. """
+        if not self.enabled:
+            return
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats( str(self.profile_path) )
+            log.info( f'profile saved to, ``{self.profile_path}``; top functions by cumulative time...\n{self.summarize_profile()}' )
+        if self.trace_path:
+            trace_data = { 'traceEvents': self.events, 'displayTimeUnit': 'ms' }
+            with open( self.trace_path, 'w' ) as f:
+                json.dump( trace_data, f )
+            log.info( f'trace with ``{len(self.events)}`` spans saved to, ``{self.trace_path}``' )
+        self.enabled = False
+        return
+
+    def summarize_profile( self, limit: int = 25 ) -> str:
+        """ Returns the top `limit` functions, sorted by cumulative time.
+            Called by finish(). """
+        stream = io.StringIO()
+        stats = pstats.Stats( self.profiler, stream=stream )
+        stats.sort_stats( 'cumulative' ).print_stats( limit )
+        return stream.getvalue()
+
+    ## end class Tracer
+
+
+TRACER = Tracer()
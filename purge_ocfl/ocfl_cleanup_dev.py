@@ -1,6 +1,9 @@
-import os, subprocess
+import argparse, os, pathlib, subprocess, sys
 from dotenv import load_dotenv, find_dotenv
 
+sys.path.insert( 0, str(pathlib.Path(__file__).resolve().parent.parent) )  # repo-root, for `common`
+from common.tracing_helper import TRACER
+
 # load variables from .env file
 load_dotenv( find_dotenv() )
 OCFL_DIR = os.getenv('OCFL_DIR')
@@ -36,6 +39,13 @@ def setup_stuff():
         log.exception (f"Failed to change directory to {OCFL_DIR}")
         exit(1)
 
+def parse_args():
+    # Optional profiling; see `common/tracing_helper.py`
+    parser = argparse.ArgumentParser(description='Purges OCFL objects for the pids listed in PIDS_FILE.')
+    parser.add_argument('--profile', required=False, help='optional; filepath to write cProfile/pstats output to')
+    parser.add_argument('--trace', required=False, help='optional; filepath to write Chrome trace-event JSON to')
+    return parser.parse_args()
+
 def read_pids():
     # Read pids from file
     with open(PIDS_FILE, 'r', encoding="ascii") as file:
@@ -47,6 +57,8 @@ def read_pids():
 if __name__ == '__main__':
     log.info ("Starting...")
 
+    args = parse_args()
+    TRACER.start(profile_path=args.profile, trace_path=args.trace)  # before setup_stuff() changes directory, so relative paths resolve
     setup_stuff()
     pids_to_delete = read_pids()
     assert len(pids_to_delete) > 0, "No pids found in file"
@@ -56,14 +68,16 @@ if __name__ == '__main__':
         log.info (f"Processing {pid}")
         
         # if OCFL object exists, purge it    
-        result = subprocess.run([ROCFL_CMD, 'ls', pid], stdout=subprocess.DEVNULL)
+        with TRACER.span('rocfl_ls', cat='subprocess', pid=pid):
+            result = subprocess.run([ROCFL_CMD, 'ls', pid], stdout=subprocess.DEVNULL)
         if result.returncode == 0:
             # if DRY_RUN is set to True, simply log the command that would be run
             if DRY_RUN.lower() == 'true':
                 log.info(f"DRY RUN: {ROCFL_CMD} purge {pid} --force")
             elif DRY_RUN.lower() == 'false':
                 # Note: if you want to get prompted for confirmation, remove the --force flag
-                subprocess.run([ROCFL_CMD, 'purge', pid, '--force'])
+                with TRACER.span('rocfl_purge', cat='subprocess', pid=pid):
+                    subprocess.run([ROCFL_CMD, 'purge', pid, '--force'])
                 log.info (f"Purged {pid} from {OCFL_DIR}")
             else:
                 log.info ("DRY_RUN must be set to either 'true' or 'false'")
@@ -71,4 +85,5 @@ if __name__ == '__main__':
         else:
             log.info (f"No OCFL object found for {pid} in {OCFL_DIR}")
 
+    TRACER.finish()
     log.info ("...Done")
\ No newline at end of file
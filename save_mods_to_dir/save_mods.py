@@ -4,6 +4,9 @@ Typical usage:
 $ cd /path/to/bdr_scripts_public/save_mods_to_dir/
 $ source ../../env/bin/activate
 $ python ./save_mods.py --output_dir_path "/path/to/output_dir" --pids_list_path "/path/to/bdr_pids.txt"
+Optional profiling (see `common/tracing_helper.py`):
+$ python ./save_mods.py --output_dir_path "/path/to/output_dir" --pids_list_path "/path/to/bdr_pids.txt" --profile "./sm.pstats" --trace "./sm_trace.json"
+- cProfile covers the parent process; the trace includes each worker's download and xml-check spans.
 """
 
 import argparse, logging, os, pathlib, pprint, sys, time
@@ -13,6 +16,9 @@ from multiprocessing import Pool
 
 from dotenv import load_dotenv, find_dotenv
 
+sys.path.insert( 0, str(pathlib.Path(__file__).resolve().parent.parent) )  # repo-root, for `common`
+from common.tracing_helper import TRACER
+
 
 ## load envars & constants ------------------------------------------
 # dotenv_abs_path = pathlib.Path(__file__).resolve().parent.parent.parent / '.env'
@@ -52,6 +58,8 @@ def config_parser() -> argparse.ArgumentParser:
     parser.add_argument( '--check_envars', required=False, action='store_true', help='optional; displays envars, and exits' )
     parser.add_argument( '--output_dir_path', required=False, help='required; full-path to the output_directory' )
     parser.add_argument( '--pids_list_path', required=False, help='required if no `pids_list` flag; filepath to a file of BDR-PIDs, one PID per line' )
+    parser.add_argument( '--profile', required=False, help='optional; filepath to write cProfile/pstats output to' )
+    parser.add_argument( '--trace', required=False, help='optional; filepath to write Chrome trace-event JSON to' )
     # parser.add_argument( '--pids_list', required=False, help='required if no `--pids_list_path` flag; comma-separated string of BDR-PIDs' )
     # parser.add_argument( '--version', action='store_true', help='optional; shows git commit hash, and exits' )
     return parser
@@ -103,7 +111,7 @@ def grab_and_save_mods( url: str, output_filepath: pathlib.Path, pid: str ):
     log.debug( f'url, ``{url}``' )
     log.debug( f'about to call urlopen() for pid, ``{pid}``' )
     try:
-        with urllib.request.urlopen( url ) as response:
+        with TRACER.span( 'mods_url_get', cat='network', pid=pid ), urllib.request.urlopen( url ) as response:
             if response.status == 200:
                 log.debug( f'got a 200 response for pid, ``{pid}``' )
                 with open( output_filepath, 'wb' ) as mods_output_file:
@@ -118,7 +126,8 @@ def grab_and_save_mods( url: str, output_filepath: pathlib.Path, pid: str ):
 def check_well_formed_xml( output_filepath: pathlib.Path, pid: str ):
     """ Checks if the file is well-formed XML. """
     try:
-        ET.parse( output_filepath)
+        with TRACER.span( 'check_well_formed_xml', cat='xml', pid=pid ):
+            ET.parse( output_filepath)
         validity = True
     except ET.ParseError:
         validity = False
@@ -131,10 +140,11 @@ def check_well_formed_xml( output_filepath: pathlib.Path, pid: str ):
 
 
 # def download_mods( pid: str, output_dir_path: pathlib.Path ) -> None:
-def download_mods( pid: str, output_dir_path: pathlib.Path, index: int ) -> None:
+def download_mods( pid: str, output_dir_path: pathlib.Path, index: int ) -> list:
     """ Manager function.
         Downloads MODS files to the specified directory, for given PIDS.
-        Called by parse_args(). """
+        Returns the worker's trace-events (empty unless tracing is on), for the parent to collect.
+        Called by run_multiprocessing(). """
     log.debug( f'processing pid, ``{pid}``' )
     url = MODS_URL_PATTERN.format( PID_VAR=pid )
     log.debug( f'url, ``{url}``' )
@@ -144,7 +154,7 @@ def download_mods( pid: str, output_dir_path: pathlib.Path, index: int ) -> None
     ## show progress ------------------------------------------------
     if (index + 1) % 10 == 0:
         log.info(f'Processed {index + 1} items.')
-    return
+    return TRACER.drain()
 
 
 def run_multiprocessing( output_dir_path: pathlib.Path, pids_list_path: pathlib.Path ) -> None:
@@ -156,10 +166,14 @@ def run_multiprocessing( output_dir_path: pathlib.Path, pids_list_path: pathlib.
     with open( pids_list_path, 'r' ) as pids_file:
         pids: list = pids_file.read().splitlines()
         log.info( f'pids to process, ``{pprint.pformat(pids)}``' )
-    with Pool( processes=PROCESSES ) as pool:
+    initializer = TRACER.enable_for_worker if TRACER.enabled else None
+    with Pool( processes=int(PROCESSES), initializer=initializer, initargs=(TRACER.origin_ns,) ) as pool:
         # args = [ (pid, output_dir_path) for pid in pids ]
         args = [ (pid, output_dir_path, index) for index, pid in enumerate(pids) ]
-        pool.starmap( download_mods, args )        
+        with TRACER.span( 'download_all_mods', pid_count=len(pids) ):
+            worker_events: list = pool.starmap( download_mods, args )
+    for events in worker_events:
+        TRACER.add_events( events )
     return
 
 
@@ -182,7 +196,9 @@ def parse_args():
     pids_list_path: pathlib.Path = validate_path( args.pids_list_path )
     ## call manager function just above -----------------------------
     # download_mods( output_dir_path, pids_list_path )
+    TRACER.start( profile_path=args.profile, trace_path=args.trace )  # no-op unless `--profile` or `--trace` is passed
     run_multiprocessing( output_dir_path, pids_list_path )
+    TRACER.finish()
     return
 
 
@@ -1,31 +1,51 @@
+import argparse
+import pathlib
+import sys
 import urllib.request
 import json
 from columnar import columnar
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))  # repo-root, for `common`
+from common.tracing_helper import TRACER
+
 def get_bdr_collections():
     '''returns a dict like "'collection name':[number of items]"'''
 
     collection_field = 'ir_collection_name' # field to facet on
     bdr_api = 'https://repository.library.brown.edu/api/search/'
     solr_query = f'?q=*&facet=on&facet.field={collection_field}&rows=0'
-    query_result = urllib.request.urlopen(bdr_api + solr_query).read()
+    with TRACER.span('facet_query', cat='network', field=collection_field):
+        query_result = urllib.request.urlopen(bdr_api + solr_query).read()
     qjson = json.loads(query_result)
     # drill down to list
     facet_counts = qjson['facet_counts']['facet_fields'][collection_field]
-    
+    result = facet_counts_to_dict(facet_counts)
+
+    return result 
+
+def facet_counts_to_dict(facet_counts):
+    '''returns a dict like "'collection name':[number of items]" from a solr facet-list
+    >>> facet_counts_to_dict(['coll A', 10, 'coll B', 3])
+    {'coll A': 10, 'coll B': 3}
+    '''
     # facet_counts is a list like: 
     #   ['collection name', # items,'collection name', # items, ...]
     # so, make dict like:
     #   {facet_counts[0]:facet_counts[1],facet_counts[2]:facet_counts[3], ...]
     facet_iter = iter(list(facet_counts))
-    result = {i:next(facet_iter) for i in facet_iter}
-
-    return result 
+    return {i:next(facet_iter) for i in facet_iter}
 
 if __name__ == '__main__':
+    # optional profiling; see `common/tracing_helper.py`
+    parser = argparse.ArgumentParser(description='Lists BDR collections and their item-counts.')
+    parser.add_argument('--profile', required=False, help='optional; filepath to write cProfile/pstats output to')
+    parser.add_argument('--trace', required=False, help='optional; filepath to write Chrome trace-event JSON to')
+    args = parser.parse_args()
+    TRACER.start(profile_path=args.profile, trace_path=args.trace)
     # use columnar to make printout show columns
     bdr_collections = get_bdr_collections()
     colls_table = [[key,value] for key,value in bdr_collections.items()]
     table_headers = ['collection','no. items']
     print(columnar(colls_table,headers=table_headers,no_borders=True))
-    print(f'Total number of collections: {len(bdr_collections)}')
\ No newline at end of file
+    print(f'Total number of collections: {len(bdr_collections)}')
+    TRACER.finish()
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Reports progress of an `update_hhoag_mods_for_org.py` run, from its tracker-files, and writes a retry org-list.
+
+Example usage:
+    $ python ./update_hhoag_mods/tracker_report.py --mods_dir "bar" --tracker_dir "baz" --output_dir "qux"
+
+Writes, to the output-dir:
+- `tracker_report.json` -- overall counts, per-org counts, and problem-errors grouped by type.
+- `retry_org_list.txt` -- comma-separated orgs with problem or pending items; ready for `--org_list_path retry_org_list.txt --retry`.
+    - `--retry` is needed because the update script writes an org's `__whole_org_updated.json` tracker-file even when some of its items failed.
+
+Counts per org:
+- done: items with an `__item_updated.json` tracker-file.
+- problem: items with an `__item_problem.json` tracker-file, and no `__item_updated.json` tracker-file.
+- pending: items with a mods-file in the mods-dir, but no tracker-file.
+
+Note that some of the functions contain doctests. All doctests can be run with the following command:
+`python -m doctest ./update_hhoag_mods/tracker_report.py -v`
+
+Code structure:
+- dundermain at bottom.
+- manager function just above it.
+- helper functions start at top in order of use.
+"""
+
+import argparse, collections, json, logging, os, pathlib, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+
+## setup logging ----------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
+    datefmt='%d/%b/%Y %H:%M:%S' )
+log = logging.getLogger( __name__ )
+
+ORG_SUFFIX = '__whole_org_updated.json'
+UPDATED_SUFFIX = '__item_updated.json'
+PROBLEM_SUFFIX = '__item_problem.json'
+MODS_SUFFIX = '.mods.xml'
+
+
+## helpers start (manager function is after helpers) ----------------
+
+
+def config_parser() -> argparse.ArgumentParser:
+    """ Configures parser.
+        Called by dundermain. """
+    parser = argparse.ArgumentParser( description='Reports progress from the update_hhoag_mods tracker-files, and writes a retry org-list.' )
+    parser.add_argument( '--mods_dir', required=True, help='takes path to directory containing pre-made org-mods and item-mods files' )
+    parser.add_argument( '--tracker_dir', required=True, help='takes path to directory containing the tracker files' )
+    parser.add_argument( '--output_dir', required=True, help='takes path to directory to write the report and retry org-list to' )
+    parser.add_argument( '--workers', required=False, type=int, default=16, help='optional; number of scandir threads; defaults to 16' )
+    return parser
+
+
+def list_subdirs( dir_path: str ) -> list:
+    """ Returns the immediate sub-directory paths; used to fan the walks out across threads.
+        Called by scan_mods_dir() and scan_tracker_dir(). """
+    with os.scandir( dir_path ) as entries:
+        return [ entry.path for entry in entries if entry.is_dir( follow_symlinks=False ) ]
+
+
+def collect_mods_ids( dir_path: str ) -> list:
+    """ Recursively collects hh_ids of mods-files under dir_path, using os.scandir (no per-file stat calls on most platforms).
+        Called, in a worker-thread, by scan_mods_dir(). """
+    hh_ids = []
+    stack = [ dir_path ]
+    while stack:
+        current = stack.pop()
+        with os.scandir( current ) as entries:
+            for entry in entries:
+                if entry.is_dir( follow_symlinks=False ):
+                    stack.append( entry.path )
+                elif entry.name.endswith( MODS_SUFFIX ):
+                    hh_ids.append( entry.name[:-len(MODS_SUFFIX)] )
+    return hh_ids
+
+
+def collect_files_only( dir_path: str ) -> list:
+    """ Collects hh_ids of mods-files sitting directly in dir_path (the sub-dirs are walked separately).
+        Called by scan_mods_dir(). """
+    with os.scandir( dir_path ) as entries:
+        return [ entry.name[:-len(MODS_SUFFIX)] for entry in entries if entry.name.endswith(MODS_SUFFIX) and entry.is_file() ]
+
+
+def org_from_hh_id( hh_id: str ) -> str:
+    """ Returns the org-id for an org or item hh_id.
+        Called by scan_mods_dir().
+    >>> org_from_hh_id( 'HH123456' )
+    'HH123456'
+    >>> org_from_hh_id( 'HH123456_0001' )
+    'HH123456'
+    """
+    return hh_id.split( '_' )[0]
+
+
+def scan_mods_dir( mods_directory_path: pathlib.Path, executor: ThreadPoolExecutor ) -> dict:
+    """ Returns { org: set-of-hh_ids } for every mods-file in the mods-dir.
+        Called by manage_report(). """
+    top_level_ids: list = collect_files_only( str(mods_directory_path) )
+    results = executor.map( collect_mods_ids, list_subdirs(str(mods_directory_path)) )
+    org_ids = collections.defaultdict( set )
+    for hh_ids in [ top_level_ids, *results ]:
+        for hh_id in hh_ids:
+            org_ids[ org_from_hh_id(hh_id) ].add( hh_id )
+    log.info( f'found ``{sum(len(ids) for ids in org_ids.values())}`` mods-files for ``{len(org_ids)}`` orgs' )
+    return org_ids
+
+
+def classify_error( err: str ) -> str:
+    """ Returns a short error-type for grouping problem-tracker errors.
+        Called by scan_org_tracker_dir().
+    >>> classify_error( 'WARNING: pid not found for item ``HH123456_0001``' )
+    'pid_not_found'
+    >>> classify_error( 'mods-file not schema-valid, ``/path/to/HH123456_0001.mods.xml``; errors, ``[...]``' )
+    'mods_not_schema_valid'
+    >>> classify_error( 'Traceback (most recent call last):\\n  File "x", line 1\\nrequests.exceptions.ReadTimeout: timed out\\n' )
+    'requests.exceptions.ReadTimeout'
+    >>> classify_error( 'something odd happened' )
+    'other'
+    """
+    if 'pid not found' in err:
+        return 'pid_not_found'
+    if 'not well-formed' in err:
+        return 'mods_not_well_formed'
+    if 'not schema-valid' in err:
+        return 'mods_not_schema_valid'
+    last_line: str = err.strip().splitlines()[-1] if err.strip() else ''
+    if ':' in last_line and ' ' not in last_line.split( ':' )[0]:  # looks like `SomeException: message`
+        return last_line.split( ':' )[0]
+    return 'other'
+
+
+def scan_org_tracker_dir( dir_path: str ) -> list:
+    """ Scans a single `HH12/3456` tracker-dir; returns a list of per-org dicts (usually just one).
+        Called, in a worker-thread, by scan_tracker_dir(). """
+    orgs = {}
+    def org_entry( org: str ) -> dict:
+        return orgs.setdefault( org, {'org': org, 'org_updated': False, 'updated': set(), 'problems': {}} )
+    with os.scandir( dir_path ) as entries:
+        for entry in entries:
+            name: str = entry.name
+            if name.endswith( UPDATED_SUFFIX ):
+                hh_id = name[:-len(UPDATED_SUFFIX)]
+                org_entry( org_from_hh_id(hh_id) )['updated'].add( hh_id )
+            elif name.endswith( PROBLEM_SUFFIX ):
+                hh_id = name[:-len(PROBLEM_SUFFIX)]
+                try:
+                    with open( entry.path ) as f:
+                        err: str = json.load( f ).get( 'err', '' )
+                except ( OSError, ValueError ) as e:
+                    err = f'unreadable problem-file: {e}'
+                org_entry( org_from_hh_id(hh_id) )['problems'][ hh_id ] = classify_error( err )
+            elif name.endswith( ORG_SUFFIX ):
+                org_entry( name[:-len(ORG_SUFFIX)] )['org_updated'] = True
+    return list( orgs.values() )
+
+
+def scan_tracker_dir( tracker_directory_path: pathlib.Path, executor: ThreadPoolExecutor ) -> dict:
+    """ Returns { org: org-tracker-dict } for every org in the `HH12/3456/` tracker-tree.
+        The leaf-dirs are scanned in parallel.
+        Called by manage_report(). """
+    leaf_dirs = []
+    for part_a_dir in list_subdirs( str(tracker_directory_path) ):
+        leaf_dirs.extend( list_subdirs(part_a_dir) )
+    tracker_data = {}
+    for org_dicts in executor.map( scan_org_tracker_dir, leaf_dirs ):
+        for org_dict in org_dicts:
+            tracker_data[ org_dict['org'] ] = org_dict
+    log.info( f'scanned ``{len(leaf_dirs)}`` tracker-dirs; found trackers for ``{len(tracker_data)}`` orgs' )
+    return tracker_data
+
+
+def build_report( org_ids: dict, tracker_data: dict ) -> dict:
+    """ Cross-checks the mods-dir against the tracker-data; returns the report-dict.
+        Called by manage_report().
+    >>> org_ids = { 'HH000001': {'HH000001', 'HH000001_0001', 'HH000001_0002'} }
+    >>> tracker_data = { 'HH000001': {'org': 'HH000001', 'org_updated': True, 'updated': {'HH000001'}, 'problems': {'HH000001_0001': 'pid_not_found'}} }
+    >>> report = build_report( org_ids, tracker_data )
+    >>> report['overall']
+    {'orgs': 1, 'orgs_updated': 1, 'items': 3, 'done': 1, 'problem': 1, 'pending': 1}
+    >>> report['retry_orgs']
+    ['HH000001']
+    >>> report['error_types']
+    {'pid_not_found': {'count': 1, 'examples': ['HH000001_0001']}}
+    """
+    overall = { 'orgs': 0, 'orgs_updated': 0, 'items': 0, 'done': 0, 'problem': 0, 'pending': 0 }
+    per_org = {}
+    error_types = {}
+    retry_orgs = []
+    for org in sorted( set(org_ids) | set(tracker_data) ):
+        hh_ids: set = org_ids.get( org, set() )
+        tracked: dict = tracker_data.get( org, {'org_updated': False, 'updated': set(), 'problems': {}} )
+        done: set = tracked['updated']
+        problem_ids = [ hh_id for hh_id in tracked['problems'] if hh_id not in done ]
+        pending: set = hh_ids - done - set( problem_ids )
+        org_counts = {
+            'org_updated': tracked['org_updated'],
+            'items': len( hh_ids ),
+            'done': len( done ),
+            'problem': len( problem_ids ),
+            'pending': len( pending ) }
+        per_org[ org ] = org_counts
+        overall['orgs'] += 1
+        overall['orgs_updated'] += int( tracked['org_updated'] )
+        for key in ( 'items', 'done', 'problem', 'pending' ):
+            overall[ key ] += org_counts[ key ]
+        for hh_id in sorted( problem_ids ):
+            error_type: str = tracked['problems'][ hh_id ]
+            group = error_types.setdefault( error_type, {'count': 0, 'examples': []} )
+            group['count'] += 1
+            if len( group['examples'] ) < 10:
+                group['examples'].append( hh_id )
+        if problem_ids or pending:
+            retry_orgs.append( org )
+    return { 'overall': overall, 'error_types': error_types, 'retry_orgs': retry_orgs, 'per_org': per_org }
+
+
+def write_outputs( report: dict, output_directory_path: pathlib.Path ) -> None:
+    """ Writes the report-json and the retry org-list.
+        Called by manage_report(). """
+    output_directory_path.mkdir( parents=True, exist_ok=True )
+    timestamp: str = time.strftime( '%Y-%m-%d %H:%M:%S', time.localtime() )
+    with open( output_directory_path / 'tracker_report.json', 'w' ) as f:
+        f.write( json.dumps({'timestamp': timestamp, **report}, sort_keys=True, indent=2) )
+    with open( output_directory_path / 'retry_org_list.txt', 'w' ) as f:
+        f.write( ','.join(report['retry_orgs']) )
+    log.info( f'report and retry org-list written to, ``{output_directory_path}``' )
+    return
+
+
+## manager function -------------------------------------------------
+
+def manage_report( mods_directory_path: pathlib.Path,
+                   tracker_directory_path: pathlib.Path,
+                   output_directory_path: pathlib.Path,
+                   workers: int ) -> None:
+    """ Manager function
+        Called by dundermain. """
+    with ThreadPoolExecutor( max_workers=workers ) as executor:  # scandir is i/o-bound, so threads suffice
+        org_ids: dict = scan_mods_dir( mods_directory_path, executor )
+        tracker_data: dict = scan_tracker_dir( tracker_directory_path, executor )
+    report: dict = build_report( org_ids, tracker_data )
+    write_outputs( report, output_directory_path )
+    log.info( f'overall, ``{report["overall"]}``' )
+    log.info( f'error_types, ``{ {k: v["count"] for k, v in report["error_types"].items()} }``' )
+    already_marked = [ org for org in report['retry_orgs'] if report['per_org'][org]['org_updated'] ]
+    if already_marked:
+        log.info( f'``{len(already_marked)}`` retry-orgs have a `{ORG_SUFFIX}` tracker-file; re-run them with `--org_list_path retry_org_list.txt --retry`' )
+    if not report['retry_orgs']:
+        log.info( 'no orgs need a retry; `retry_org_list.txt` is empty' )
+    return
+
+
+## dunndermain ------------------------------------------------------
+if __name__ == '__main__':
+    """ Receives and validates dir-paths, then calls manager function. """
+    start_time = time.monotonic()
+    parser: argparse.ArgumentParser = config_parser()
+    args: argparse.Namespace = parser.parse_args()
+    mods_directory_path = pathlib.Path( args.mods_dir ).resolve()
+    tracker_directory_path = pathlib.Path( args.tracker_dir ).resolve()
+    output_directory_path = pathlib.Path( args.output_dir ).resolve()
+    for dir_path in ( mods_directory_path, tracker_directory_path ):
+        if not dir_path.is_dir():
+            print( f'Error: The path {dir_path} is not a directory.', file=sys.stderr )
+            sys.exit(1)
+    manage_report( mods_directory_path, tracker_directory_path, output_directory_path, args.workers )
+    elapsed_time = time.monotonic() - start_time
+    log.info( f'total elapsed time, ``{elapsed_time:.2f}`` seconds' )
@@ -5,8 +5,15 @@ Checks and updates tracker files.
 Example usage:
 - minimum required:
     $ python ./update_hhoag_mods.py --org_list "fooA,fooB" --mods_dir "bar" --tracker_dir "baz" 
+- org-list alternatives (exactly one of `--org_list`, `--org_list_path`, `--all_orgs` is required):
+    $ python ./update_hhoag_mods.py --org_list_path "./retry_org_list.txt" --retry --mods_dir "bar" --tracker_dir "baz"
+    $ python ./update_hhoag_mods.py --all_orgs --mods_dir "bar" --tracker_dir "baz"
+- to spread a run across machines, give each machine the same args and a different shard (here, machine 2 of 3):
+    $ python ./update_hhoag_mods.py --all_orgs --shard "1/3" --mods_dir "bar" --tracker_dir "/shared/baz"
 - to check envars and quit:
     $ python ./update_hhoag_mods.py --org_list "fooA,fooB" --mods_dir "bar" --tracker_dir "baz" --check_envars "True"
+- to write a cProfile/pstats file and a Chrome trace-event file (see `common/tracing_helper.py`):
+    $ python ./update_hhoag_mods.py --org_list "fooA,fooB" --mods_dir "bar" --tracker_dir "baz" --profile "./uhhm.pstats" --trace "./uhhm_trace.json"
 
 Note that some of the functions contain doctests. All doctests can be run with the following command:
 `python -m doctest ./update_hhoag_mods/update_hhoag_mods_for_org.py -v`
@@ -20,15 +27,24 @@ Code structure:
 - helper functions start at top in order of use.
 """
 
-import argparse, collections, json, logging, os, pathlib, pprint, subprocess, sys, time
+import argparse, collections, hashlib, json, logging, os, pathlib, pprint, socket, subprocess, sys, time, uuid
+from multiprocessing import Pool
+
 import requests
 from dotenv import load_dotenv, find_dotenv
+from lxml import etree
+
+sys.path.insert( 0, str(pathlib.Path(__file__).resolve().parent.parent) )  # repo-root, for `common`
+from common.tracing_helper import TRACER
 
 
 ## load envars -----------------------------------------------------
 load_dotenv( find_dotenv(raise_error_if_not_found=True) )
 BDR_API_ROOT: str = os.environ[ 'UHHM__BDR_API_URL_ROOT' ]  # UHHM for "update hall-hoag mods"
 LGLVL: str = os.environ.get( 'UHHM__LOGLEVEL', 'DEBUG' )
+MODS_XSD_PATH: str = os.environ.get( 'UHHM__MODS_XSD_PATH', '' )  # local copy of the MODS xsd; if empty, pre-flight validation checks well-formedness only
+VALIDATION_PROCESSES: int = int( os.environ.get('UHHM__VALIDATION_PROCESSES', 2) )  # number of pre-flight validation processes
+LEASE_SECONDS: int = int( os.environ.get('UHHM__LEASE_SECONDS', 3600) )  # an org-lease not renewed within this time is treated as abandoned
 BINARY_PATH: str = os.environ[ 'UHHM__UPDATE_MODS_BINARY_PATH' ]
 ## for the `update_mods` python-binary (UM) ##
 BINARY_API_AGENT: str = os.environ[ 'UM__API_AGENT' ]
@@ -42,9 +58,10 @@ BINARY_MESSAGE: str = os.environ[ 'UM__MESSAGE' ]
 log_format = '[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s'
 date_format = '%d/%b/%Y %H:%M:%S'
 ## file-logging ---------------------------------
+LOG_PATH = pathlib.Path(__file__).resolve().parent.parent.parent / 'logs' / 'update_hhoag_mods.log'  # the `logs` dir next to the `bdr_scripts_public` dir
 lglvldct = { 'DEBUG': logging.DEBUG, 'INFO': logging.INFO }
 logging.basicConfig(
-    level=lglvldct[LGLVL], format=log_format, filename='../logs/update_hhoag_mods.log', datefmt=date_format )
+    level=lglvldct[LGLVL], format=log_format, filename=str(LOG_PATH), datefmt=date_format )
 log = logging.getLogger( __name__ )
 ## console-logging ------------------------------
 ch = logging.StreamHandler()    # ch stands for `Console Handler`
@@ -61,13 +78,52 @@ def config_parser() -> argparse.ArgumentParser:
     """ Configures parser.
         Called by dundermain. """
     parser = argparse.ArgumentParser(description='Recursively finds JSON files in specified directory.')
-    parser.add_argument( '--org_list', required=True, help='takes orgs to process; example "HH123456" or "HH123456,HH654321"' )
+    org_source = parser.add_mutually_exclusive_group( required=True )
+    org_source.add_argument( '--org_list', help='takes orgs to process; example "HH123456" or "HH123456,HH654321"' )
+    org_source.add_argument( '--org_list_path', help='takes path to a file of orgs to process, comma- or newline-separated' )
+    org_source.add_argument( '--all_orgs', action='store_true', help='processes every org found in the mods-dir' )
+    parser.add_argument( '--retry', required=False, action='store_true', help='optional; ignores whole-org tracker-files, so orgs with problem items are re-processed; done items are still skipped' )
+    parser.add_argument( '--shard', required=False, default='0/1', help='optional; "i/N" processes only the orgs hashed to shard i of N; defaults to "0/1" (all)' )
     parser.add_argument( '--mods_dir', required=True, help='takes path to directory containing pre-made org-mods and item-mods files' )
     parser.add_argument( '--tracker_dir', required=True, help='takes path to directory containing the tracker files' )
     parser.add_argument( '--check_envars', required=False, help='if "True", checks envars and exits' )
+    parser.add_argument( '--profile', required=False, help='optional; filepath to write cProfile/pstats output to' )
+    parser.add_argument( '--trace', required=False, help='optional; filepath to write Chrome trace-event JSON to' )
     return parser
 
 
+def parse_shard( shard_arg: str ) -> tuple:
+    """ Parses and validates the `--shard` arg.
+        Called by dundermain.
+    >>> parse_shard( '1/3' )
+    (1, 3)
+    >>> parse_shard( '3/3' )
+    Traceback (most recent call last):
+    ...
+    ValueError: shard must be "i/N" with 0 <= i < N; got ``3/3``
+    """
+    try:
+        shard_index, shard_count = ( int(part) for part in shard_arg.split('/') )
+    except ValueError:
+        shard_index, shard_count = -1, 0
+    if not 0 <= shard_index < shard_count:
+        raise ValueError( f'shard must be "i/N" with 0 <= i < N; got ``{shard_arg}``' )
+    return ( shard_index, shard_count )
+
+
+def read_org_list_file( org_list_path: pathlib.Path ) -> list:
+    """ Reads orgs from a file; accepts comma- and/or newline-separated orgs (eg, the `tracker_report.py` retry org-list).
+        Exits if the file has no orgs, so an empty retry org-list never turns into an all-orgs run.
+        Called by dundermain. """
+    with open( org_list_path, 'r' ) as f:
+        text: str = f.read()
+    orgs_list = [ org.strip() for org in text.replace( '\n', ',' ).split( ',' ) if org.strip() ]
+    if not orgs_list:
+        print( f'Error: No orgs found in {org_list_path}; nothing to process.', file=sys.stderr )
+        sys.exit(1)
+    return orgs_list
+
+
 def validate_arg_paths( mods_directory_path: pathlib.Path, tracker_directory_path: pathlib.Path ) -> None:
     """ Validates argument paths.
         Called by dundermain. """
@@ -90,6 +146,9 @@ Envars:
 For this `update_hhoag_mods_for_org.py` script...
 - BDR_API_ROOT, ``{BDR_API_ROOT}``          
 - LGLVL, ``{LGLVL}``
+- LEASE_SECONDS, ``{LEASE_SECONDS}``
+- MODS_XSD_PATH, ``{MODS_XSD_PATH}``
+- VALIDATION_PROCESSES, ``{VALIDATION_PROCESSES}``
 
 For the `update_mods_python_binary` file...
 - BINARY_PATH, ``{BINARY_PATH}``
@@ -105,6 +164,31 @@ For the `update_mods_python_binary` file...
     return
 
 
+def index_mods_files( mods_directory_path: pathlib.Path ) -> dict:
+    """ Walks the mods-dir once, and returns { org: [mods-filepaths] }.
+        Avoids a whole-mods-dir walk per org, which matters for `--all_orgs` runs.
+        Called by manage_org_mods_update(). """
+    mods_index = collections.defaultdict( list )
+    with TRACER.span( 'index_mods_files', cat='filesystem' ):
+        for mods_filepath in mods_directory_path.rglob( '*mods.xml' ):
+            org: str = parse_id( mods_filepath ).split( '_' )[0]
+            mods_index[ org ].append( mods_filepath )
+    log.info( f'indexed mods-files for ``{len(mods_index)}`` orgs' )
+    return mods_index
+
+
+def org_in_shard( org: str, shard_index: int, shard_count: int ) -> bool:
+    """ Assigns the org to a shard with a stable hash (unlike `hash()`, which is randomized per-process).
+        Called by manage_org_mods_update().
+    >>> [ org_in_shard('HH123456', i, 3) for i in range(3) ].count( True )
+    1
+    >>> org_in_shard( 'HH123456', 0, 1 )
+    True
+    """
+    digest: str = hashlib.sha1( org.encode('utf-8') ).hexdigest()
+    return int( digest, 16 ) % shard_count == shard_index
+
+
 def get_org_tracker_filepath( org: str, tracker_directory_path: pathlib.Path ) -> pathlib.Path:
     """ Gets the org's tracker file path.
         Called by manage_org_mods_update(). 
@@ -128,12 +212,172 @@ def check_tracker( tracker_filepath: pathlib.Path ) -> bool:
     return return_val
 
 
-def get_filepath_data( org: str, mods_directory_path: pathlib.Path ) -> dict:
+def get_org_lease_filepath( org: str, tracker_directory_path: pathlib.Path ) -> pathlib.Path:
+    """ Gets the org's lease file path.
+        Called by manage_org_mods_update(). 
+    Doctest:
+    >>> get_org_lease_filepath( 'HH123456', pathlib.Path('/path/to/foo') )    
+    PosixPath('/path/to/foo/HH12/3456/HH123456__org_lease.json')
+    """
+    part_a, part_b = org[:4], org[4:8]
+    return tracker_directory_path / part_a / part_b / f'{org}__org_lease.json'
+
+
+def read_lease_token( lease_filepath: pathlib.Path ) -> str:
+    """ Returns the lease's owner-token, or '' if the lease can't be read.
+        Called by the lease functions below. """
+    try:
+        with open( lease_filepath, 'r' ) as f:
+            return json.load( f ).get( 'token', '' )
+    except ( OSError, ValueError ):
+        return ''
+
+
+def restore_moved_lease( moved_filepath: pathlib.Path, lease_filepath: pathlib.Path ) -> None:
+    """ Puts back a lease that was moved aside but turned out to belong to someone else.
+        `os.link` won't overwrite, so if a newer lease appeared in the meantime, that one is kept.
+        Called by acquire_org_lease() and release_org_lease(). """
+    try:
+        os.link( moved_filepath, lease_filepath )
+    except FileExistsError:
+        pass
+    moved_filepath.unlink()
+    return
+
+
+def acquire_org_lease( lease_filepath: pathlib.Path ) -> str:
+    """ Tries to take the org's lease, so that no other shard or machine processes the org at the same time.
+        Returns this process's lease-token, or '' if the lease is held elsewhere.
+        - Creates the lease-file atomically (O_EXCL).
+        - If it exists but hasn't been renewed within LEASE_SECONDS (ie, its holder crashed), reclaims it:
+          renames it aside (only one contender's rename of a given file can succeed), then judges staleness from
+          the renamed file itself, so a fresh lease created by another contender in the meantime is put back, not taken.
+        Called by manage_org_mods_update(). 
+    Doctest (acquire, renew, release):
+    >>> import tempfile
+    >>> lease_filepath = pathlib.Path( tempfile.mkdtemp() ) / 'HH00' / '0001' / 'HH000001__org_lease.json'
+    >>> token = acquire_org_lease( lease_filepath )
+    >>> read_lease_token( lease_filepath ) == token
+    True
+    >>> acquire_org_lease( lease_filepath )  # held elsewhere
+    ''
+    >>> renew_org_lease( lease_filepath, token )
+    True
+    >>> release_org_lease( lease_filepath, token )
+    >>> lease_filepath.exists()
+    False
+
+    Doctest (reclaiming a stale lease):
+    >>> old_token = acquire_org_lease( lease_filepath )
+    >>> os.utime( lease_filepath, (0, 0) )  # as if its holder crashed long ago
+    >>> new_token = acquire_org_lease( lease_filepath )
+    >>> new_token not in ( '', old_token )
+    True
+    >>> renew_org_lease( lease_filepath, old_token )  # the old holder finds its lease taken
+    False
+    >>> release_org_lease( lease_filepath, old_token )  # and leaves the new holder's lease alone
+    >>> read_lease_token( lease_filepath ) == new_token
+    True
+    >>> sorted( path.name for path in lease_filepath.parent.iterdir() )  # no moved-aside files left behind
+    ['HH000001__org_lease.json']
+    """
+    lease_filepath.parent.mkdir( parents=True, exist_ok=True )
+    token = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[0:8]}'
+    lease_data: str = json.dumps( {
+        'host': socket.gethostname(),
+        'process_id': os.getpid(),
+        'timestamp': time.strftime( '%Y-%m-%d %H:%M:%S', time.localtime() ),
+        'token': token }, sort_keys=True, indent=2 )
+    for attempt in ( 'create', 'reclaim' ):
+        try:
+            fd = os.open( lease_filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY )
+        except FileExistsError:
+            if attempt == 'reclaim':
+                return ''
+            try:
+                lease_age: float = time.time() - lease_filepath.stat().st_mtime
+            except FileNotFoundError:  # released in the meantime
+                continue
+            if lease_age < LEASE_SECONDS:
+                log.info( f'lease held elsewhere, ``{lease_filepath.name}``; owner, ``{read_lease_token(lease_filepath)}``' )
+                return ''
+            moved_filepath = lease_filepath.with_name( f'{lease_filepath.stem}_reclaim_{token}.json' )
+            try:
+                os.rename( lease_filepath, moved_filepath )
+            except FileNotFoundError:  # another contender reclaimed it first
+                return ''
+            moved_lease_age: float = time.time() - os.stat( moved_filepath ).st_mtime  # rename keeps mtime; this is the file actually taken
+            if moved_lease_age < LEASE_SECONDS:  # another contender's fresh lease; put it back
+                restore_moved_lease( moved_filepath, lease_filepath )
+                return ''
+            log.warning( f'WARNING: reclaimed lease abandoned ``{moved_lease_age:.0f}`` seconds ago by ``{read_lease_token(moved_filepath)}``' )
+            moved_filepath.unlink()
+            continue
+        with os.fdopen( fd, 'w' ) as f:
+            f.write( lease_data )
+        log.debug( f'lease acquired, ``{lease_filepath}``' )
+        return token
+    return ''
+
+
+def renew_org_lease( lease_filepath: pathlib.Path, token: str ) -> bool:
+    """ Touches the lease-file so other shards can see the org is still being worked on.
+        Returns False, without touching anything, if the lease no longer belongs to this process.
+        A contender's rename-and-restore can briefly hide the lease, between the token-read and the touch, too;
+          so a missing lease is looked for again, rather than given up (which would orphan the restored lease).
+        Called by manage_item_loop(). """
+    owner_token = ''
+    for attempt in range( 3 ):
+        if attempt:
+            time.sleep( 0.5 )
+        owner_token = read_lease_token( lease_filepath )
+        if owner_token == '':  # may be mid-way through another contender's rename-and-restore
+            continue
+        if owner_token != token:
+            break
+        try:
+            os.utime( lease_filepath )
+        except FileNotFoundError:  # moved aside after the token-read; re-check
+            owner_token = ''
+            continue
+        return True
+    log.warning( f'WARNING: lease lost, ``{lease_filepath}``; owner now, ``{owner_token}``' )
+    return False
+
+
+def release_org_lease( lease_filepath: pathlib.Path, token: str ) -> None:
+    """ Removes the lease-file, if it still belongs to this process.
+        Moves it aside before checking the token, so a lease reclaimed by someone else is put back rather than deleted.
+        Called by manage_org_mods_update(). """
+    moved_filepath = lease_filepath.with_name( f'{lease_filepath.stem}_release_{token}.json' )
+    try:
+        os.rename( lease_filepath, moved_filepath )
+    except FileNotFoundError:  # may be mid-way through another contender's rename-and-restore; look once more
+        time.sleep( 0.5 )
+        try:
+            os.rename( lease_filepath, moved_filepath )
+        except FileNotFoundError:
+            log.warning( f'WARNING: lease-file missing on release, ``{lease_filepath}``' )
+            return
+    if read_lease_token( moved_filepath ) != token:
+        log.warning( f'WARNING: lease no longer ours on release; leaving it, ``{lease_filepath}``' )
+        restore_moved_lease( moved_filepath, lease_filepath )
+        return
+    moved_filepath.unlink()
+    return
+
+
+def get_filepath_data( org: str, mods_directory_path: pathlib.Path, mods_index: dict = None ) -> dict:
     """ Creates initial org-data dict and populates it with filepath info.
+        Uses the run's mods-index, when given, instead of walking the whole mods-dir.
         Called by manage_org_mods_update(). """
     # log.info( f'mods_directory_path, ``{mods_directory_path}``' )
     org_data = {}
-    mods_paths = list( mods_directory_path.rglob('*mods.xml') )
+    if mods_index is not None:
+        mods_paths = mods_index.get( org, [] )
+    else:
+        with TRACER.span( 'rglob_mods_dir', cat='filesystem', org=org ):
+            mods_paths = list( mods_directory_path.rglob('*mods.xml') )
     org_data = {}
     for mods_filepath in mods_paths:
         if org in mods_filepath.name:
@@ -161,6 +405,69 @@ def parse_id( mods_file: pathlib.Path ) -> str:
     return filename_b
 
 
+## pre-flight validation --------------------------------
+
+WORKER_SCHEMA = None  # compiled once per validation-worker by init_validation_worker()
+WORKER_SCHEMA_ERROR = ''  # set by init_validation_worker() if the schema fails to load
+
+
+def load_mods_schema( xsd_path: str ):
+    """ Loads and compiles the MODS schema; returns None if no xsd-path is set.
+        Called by manage_org_mods_update() (to fail fast on a bad xsd, before the pool starts), and by init_validation_worker(). """
+    if not xsd_path:
+        return None
+    return etree.XMLSchema( etree.parse(xsd_path) )
+
+
+def init_validation_worker( xsd_path: str ) -> None:
+    """ Loads and compiles the MODS schema once for this worker-process.
+        Errors are recorded rather than raised; a raising Pool-initializer makes the Pool respawn workers forever.
+        Called by the validation Pool, as its initializer. """
+    global WORKER_SCHEMA, WORKER_SCHEMA_ERROR
+    try:
+        WORKER_SCHEMA = load_mods_schema( xsd_path )
+    except Exception as e:
+        WORKER_SCHEMA_ERROR = f'could not load mods-schema, ``{xsd_path}``; error, ``{repr(e)}``'
+    return
+
+
+def validate_mods_file( hh_id: str, mods_path: pathlib.Path ) -> tuple:
+    """ Checks that the mods-file is well-formed and, if a schema is loaded, schema-valid.
+        Returns (hh_id, err, schema_err), where err is '' for a valid file, and schema_err is '' unless the worker's schema failed to load.
+        Called, in a worker-process, by validate_org_mods(). """
+    if WORKER_SCHEMA_ERROR:
+        return ( hh_id, '', WORKER_SCHEMA_ERROR )
+    try:
+        doc = etree.parse( str(mods_path) )
+    except ( etree.XMLSyntaxError, OSError ) as e:
+        return ( hh_id, f'mods-file not well-formed, ``{mods_path}``; error, ``{e}``', '' )
+    if WORKER_SCHEMA is not None and not WORKER_SCHEMA.validate( doc ):
+        errors: list = [ f'line {e.line}: {e.message}' for e in WORKER_SCHEMA.error_log ][0:20]
+        return ( hh_id, f'mods-file not schema-valid, ``{mods_path}``; errors, ``{errors}``', '' )
+    return ( hh_id, '', '' )
+
+
+def validate_org_mods( org_data: dict, tracker_directory_path: pathlib.Path, validation_pool ) -> tuple:
+    """ Validates the org's not-yet-processed mods-files across the validation pool.
+        Returns ( { hh_id: err } for files that failed, count of files validated ).
+        Called by manage_org_mods_update(). """
+    args = []
+    for hh_id, item_dict in org_data.items():
+        if check_tracker( get_item_tracker_filepath(hh_id, tracker_directory_path) ):
+            continue
+        args.append( (hh_id, item_dict['path']) )
+    chunksize: int = max( 1, len(args) // (VALIDATION_PROCESSES * 4) )
+    results: list = validation_pool.starmap( validate_mods_file, args, chunksize=chunksize )
+    schema_errors = { schema_err for (hh_id, err, schema_err) in results if schema_err }
+    if schema_errors:
+        raise Exception( f'validation-worker schema error(s), ``{schema_errors}``' )
+    validation_errors = { hh_id: err for (hh_id, err, schema_err) in results if err }
+    log.info( f'validated ``{len(args)}`` mods-files; ``{len(validation_errors)}`` failed' )
+    if validation_errors:
+        log.debug( f'validation_errors, partial, ``{pprint.pformat(validation_errors)[0:1000]}...``' )
+    return ( validation_errors, len(args) )
+
+
 def get_org_data_via_api( org: str ) -> list:
     """ Gets org data via BDR public API.
         Called by manage_org_mods_update(). """
@@ -172,8 +479,9 @@ def get_org_data_via_api( org: str ) -> list:
     while True:
         org_data_url = f'{org_data_url_stable_pattern}&start={start}'
         log.debug( f'org_data_url, ``{org_data_url}``' )
-        response = requests.get(org_data_url)
-        response_data = response.json()
+        with TRACER.span( 'search_api_get', cat='network', org=org, start=start ):
+            response = requests.get(org_data_url)
+            response_data = response.json()
         docs: list = response_data['response']['docs']   
         api_data.extend( docs )            
         if len( response_data['response']['docs'] ) < rows:  # means that last append was the last batch
@@ -230,7 +538,8 @@ def call_api( path: str, pid: str ) -> str:
     # cmd = [ BINARY_PATH, '--check_envars', 'True']; break  # will show envars perceived by the binary
     cmd = [ BINARY_PATH, '--mods_filepath', path, '--bdr_pid', pid ]
     log.debug( f'cmd, ``{cmd}``' )
-    result: subprocess.CompletedProcess = subprocess.run( cmd, env=env_copy, capture_output=True, text=True )
+    with TRACER.span( 'update_mods_binary', cat='subprocess', pid=pid ):
+        result: subprocess.CompletedProcess = subprocess.run( cmd, env=env_copy, capture_output=True, text=True )
     log.debug( f'result, ``{result}``' )
     ## log and return errors ----------------------------------------
     return_data = ''
@@ -289,32 +598,93 @@ def update_org_tracker( org_tracker_filepath: pathlib.Path ) -> None:
 
 def manage_org_mods_update( orgs_list: list, 
                             mods_directory_path: pathlib.Path, 
-                            tracker_directory_path: pathlib.Path ) -> None:
+                            tracker_directory_path: pathlib.Path,
+                            shard: tuple = (0, 1),
+                            retry: bool = False ) -> None:
     """ Manager function
+        - An orgs_list of None means "all orgs in the mods-dir"; an empty list means no orgs.
+        - With `retry`, whole-org tracker-files are ignored, so an org that finished with problem items is re-processed;
+          its items with an `__item_updated.json` tracker-file are still skipped.
+        - Only orgs hashed to this shard are processed; each org is also guarded by a lease-file in the tracker-dir.
+        The validation-pool is created once, so each worker compiles the schema once for the whole run.
         Called by dundermain. """
-    for org in orgs_list:
-        log.info( f'\n\nprocessing org, ``{org}``' )
-        org_tracker_filepath: pathlib.Path = get_org_tracker_filepath( org, tracker_directory_path )
-        org_already_processed: bool = check_tracker( org_tracker_filepath )
-        if org_already_processed:
-            continue
-        org_data: dict = get_filepath_data( org, mods_directory_path )  # value-dict contains path info at this point
-        api_data: list = get_org_data_via_api( org )
-        org_data: dict = merge_api_data_into_org_data( org_data, api_data )
-        manage_item_loop( org_data, tracker_directory_path, org_tracker_filepath )
-        update_org_tracker( org_tracker_filepath )
-        log.info( f'finished processing org, ``{org}``' )
+    mods_index: dict = index_mods_files( mods_directory_path )
+    if orgs_list is None:
+        orgs_list = sorted( mods_index.keys() )
+    shard_index, shard_count = shard
+    orgs_list = [ org for org in orgs_list if org_in_shard(org, shard_index, shard_count) ]
+    log.info( f'shard ``{shard_index}/{shard_count}`` has ``{len(orgs_list)}`` orgs' )
+    if not MODS_XSD_PATH:
+        log.warning( 'WARNING: UHHM__MODS_XSD_PATH not set; pre-flight validation will check well-formedness only' )
+    try:
+        load_mods_schema( MODS_XSD_PATH )  # fails fast on a bad xsd-path or schema, before any pool or lease
+    except ( OSError, etree.XMLSyntaxError, etree.XMLSchemaParseError ) as e:
+        log.error( f'ERROR: could not load mods-schema from UHHM__MODS_XSD_PATH, ``{MODS_XSD_PATH}``; error, ``{repr(e)}``' )
+        sys.exit(1)
+    with Pool( processes=VALIDATION_PROCESSES, initializer=init_validation_worker, initargs=(MODS_XSD_PATH,) ) as validation_pool:
+        for org in orgs_list:
+            log.info( f'\n\nprocessing org, ``{org}``' )
+            org_tracker_filepath: pathlib.Path = get_org_tracker_filepath( org, tracker_directory_path )
+            org_already_processed: bool = check_tracker( org_tracker_filepath ) and not retry
+            if org_already_processed:
+                continue
+            org_lease_filepath: pathlib.Path = get_org_lease_filepath( org, tracker_directory_path )
+            org_lease_token: str = acquire_org_lease( org_lease_filepath )
+            if not org_lease_token:
+                continue
+            try:  # releases the lease on any exception; only a hard crash leaves it for stale-lease reclaim
+                if check_tracker( org_tracker_filepath ) and not retry:  # finished elsewhere while this shard was checking the lease
+                    continue
+                with TRACER.span( 'get_filepath_data', org=org ):
+                    org_data: dict = get_filepath_data( org, mods_directory_path, mods_index )  # value-dict contains path info at this point
+                with TRACER.span( 'validate_org_mods', cat='xml', org=org ):
+                    ( validation_errors, validated_count ) = validate_org_mods( org_data, tracker_directory_path, validation_pool )
+                if len( validation_errors ) < validated_count:
+                    with TRACER.span( 'get_org_data_via_api', org=org ):
+                        api_data: list = get_org_data_via_api( org )
+                else:
+                    log.warning( f'WARNING: none of the ``{validated_count}`` not-yet-processed mods-files passed validation for org ``{org}``; skipping api query' )
+                    api_data = []
+                with TRACER.span( 'merge_api_data_into_org_data', org=org ):
+                    org_data: dict = merge_api_data_into_org_data( org_data, api_data )
+                with TRACER.span( 'manage_item_loop', org=org, item_count=len(org_data) ):
+                    lease_kept: bool = manage_item_loop( org_data, tracker_directory_path, org_tracker_filepath, validation_errors, org_lease_filepath, org_lease_token )
+                if not lease_kept:
+                    log.warning( f'WARNING: stopped processing org ``{org}``; its lease was taken by another run' )
+                    continue
+                with TRACER.span( 'update_org_tracker', cat='tracker_io', org=org ):
+                    update_org_tracker( org_tracker_filepath )
+                log.info( f'finished processing org, ``{org}``' )
+            finally:
+                release_org_lease( org_lease_filepath, org_lease_token )
     return
 
 def manage_item_loop( 
         org_data: dict, 
         tracker_directory_path: pathlib.Path, 
-        org_tracker_filepath: pathlib.Path ) -> None:
+        org_tracker_filepath: pathlib.Path,
+        validation_errors: dict,
+        org_lease_filepath: pathlib.Path,
+        org_lease_token: str ) -> bool:
+    """ Updates each item's mods, renewing the org's lease before each update.
+        Returns False if the lease was lost to another run, in which case the remaining items are left for that run.
+        Called by manage_org_mods_update(). """
     for i, (hh_id, item_dict) in enumerate( org_data.items() ):
         # if i > 2:  # for testing, will process the org-mods and first item-mods
         #     break
         mods_path: str = item_dict['path']
         item_tracker_filepath: pathlib.Path = get_item_tracker_filepath( hh_id, tracker_directory_path )
+        ## already processed? ---------------------------------------
+        with TRACER.span( 'check_tracker', cat='tracker_io', hh_id=hh_id ):
+            item_already_processed: bool = check_tracker( item_tracker_filepath ) 
+        if item_already_processed:  # checked first; when the api query is skipped, these items have no pid
+            continue  
+        ## failed pre-flight validation? ----------------------------
+        if hh_id in validation_errors:
+            err_msg = validation_errors[ hh_id ]
+            log.warning( f'\nWARNING: skipping item ``{hh_id}``; {err_msg}\n' )
+            update_item_tracker( item_tracker_filepath, err_msg )
+            continue
         try:
             pid: str = item_dict['pid']
         except KeyError:
@@ -323,26 +693,34 @@ def manage_item_loop(
             update_item_tracker( item_tracker_filepath, err_msg )
             continue
         log.info( f'\nprocessing item ``{hh_id}-{pid}``\n' )
-        ## already processed? ---------------------------------------
-        item_already_processed: bool = check_tracker( item_tracker_filepath ) 
-        if item_already_processed:
-            continue  
         ## process item ---------------------------------------------
+        if not renew_org_lease( org_lease_filepath, org_lease_token ):
+            return False
         err: str = call_api( mods_path, pid )  # err generally ''
-        update_item_tracker( item_tracker_filepath, err )  # updates tracker differently if there's an error
-    return
+        with TRACER.span( 'update_item_tracker', cat='tracker_io', hh_id=hh_id ):
+            update_item_tracker( item_tracker_filepath, err )  # updates tracker differently if there's an error
+    return True
 
 
 ## dunndermain ------------------------------------------------------
 if __name__ == '__main__':
     """ Receives and validates dir-path, then calls manager function. """
-    assert pathlib.Path.cwd().name == 'bdr_scripts_public', f"Error: wrong directory; cd to the `bdr_sripts_public` directory and try again."
     start_time = time.monotonic()
     ## prep args ----------------------------------------------------
     parser: argparse.ArgumentParser = config_parser()
     ## grab args ----------------------------------------------------
     args: argparse.Namespace = parser.parse_args()
-    orgs_list = [org.strip() for org in args.org_list.split(',')]  # splits on comma and strips leading and trailing whitespaces
+    if args.org_list:
+        orgs_list = [org.strip() for org in args.org_list.split(',')]  # splits on comma and strips leading and trailing whitespaces
+    elif args.org_list_path:
+        orgs_list = read_org_list_file( pathlib.Path(args.org_list_path).resolve() )
+    else:
+        orgs_list = None  # `--all_orgs`; the manager builds the list from the mods-dir
+    try:
+        shard: tuple = parse_shard( args.shard )
+    except ValueError as e:
+        print( f'Error: {e}', file=sys.stderr )
+        sys.exit(1)
     log.debug( f'orgs_list, ``{orgs_list}``' )
     mods_directory_path = pathlib.Path( args.mods_dir ).resolve()  # if a relative-path is submitted, this will resolve it to an absolute path
     tracker_directory_path = pathlib.Path( args.tracker_dir ).resolve()
@@ -353,6 +731,8 @@ if __name__ == '__main__':
     if run_envar_check and run_envar_check.lower() == 'true':
         display_envars()
     ## get to work --------------------------------------------------
-    manage_org_mods_update( orgs_list, mods_directory_path, tracker_directory_path )
+    TRACER.start( profile_path=args.profile, trace_path=args.trace )  # no-op unless `--profile` or `--trace` is passed
+    manage_org_mods_update( orgs_list, mods_directory_path, tracker_directory_path, shard, args.retry )
+    TRACER.finish()
     elapsed_time = time.monotonic() - start_time
     log.info( f'total elapsed time for all orgs, ``{elapsed_time:.2f}`` seconds' )